@@ -50,6 +50,10 @@ class App(object):
             self.metadata_thread = None
             # Instance of ImageCachingThread()
             self.caching_thread = None
+            # Instance of the library Sync() thread
+            self.sync_thread = None
+            # Instance of the Plex Companion PlaystateMgr()
+            self.playstate_thread = None
             # Dialog to skip intro
             self.skip_intro_dialog = None
 
@@ -103,6 +107,42 @@ class App(object):
         except AttributeError:
             pass
 
+    def register_sync_thread(self, thread):
+        self.sync_thread = thread
+        self.threads.append(thread)
+
+    def deregister_sync_thread(self, thread):
+        self.sync_thread = None
+        self.deregister_thread(thread)
+
+    def wake_up_sync_thread(self):
+        """
+        Lets the library sync thread know that there is new work, e.g. a
+        websocket message or a requested library scan
+        """
+        try:
+            self.sync_thread.wake_up()
+        except AttributeError:
+            pass
+
+    def register_playstate_thread(self, thread):
+        self.playstate_thread = thread
+        self.threads.append(thread)
+
+    def deregister_playstate_thread(self, thread):
+        self.playstate_thread = None
+        self.deregister_thread(thread)
+
+    def wake_up_playstate_thread(self):
+        """
+        Lets the PlaystateMgr know that something changed with Kodi's players
+        or playlists
+        """
+        try:
+            self.playstate_thread.wake_up()
+        except AttributeError:
+            pass
+
     def register_thread(self, thread):
         """
         Hit with thread [backgroundthread.Killablethread instance] to register
@@ -60,6 +60,8 @@ class Sync(object):
         self.backgroundsync_saftymargin = None
         # How many threads to download Plex metadata on sync?
         self.sync_thread_number = None
+        # How many items to download with one single metadata request on sync?
+        self.sync_batch_size = None
 
         # Shall Kodi show dialogs for syncing/caching images? (e.g. images left
         # to sync)
@@ -114,6 +116,7 @@ class Sync(object):
         self.sync_specific_plex_playlists = utils.settings('syncSpecificPlexPlaylists') == 'true'
         self.sync_specific_kodi_playlists = utils.settings('syncSpecificKodiPlaylists') == 'true'
         self.sync_thread_number = int(utils.settings('syncThreadNumber'))
+        self.sync_batch_size = int(utils.settings('syncBatchSize'))
         self.reload()
 
     def reload(self):
@@ -46,6 +46,13 @@ class Playqueue(object):
         self.plex_transient_token = None
         # Need a hack for detecting swaps of elements
         self.old_kodi_pl = []
+        # Our copy of the Kodi playlist, kept up to date by kodimonitor using
+        # Kodi's Playlist notifications. Items that were added, but not yet
+        # fetched from Kodi, are None. None if we need to fetch the entire
+        # Kodi playlist again
+        self.kodi_items = None
+        # time.monotonic() of the last time we fetched the entire Kodi playlist
+        self.kodi_items_synced = 0.0
         # Did PKC itself just change the playqueue so the PKC playqueue monitor
         # should not pick up any changes?
         self.pkc_edit = False
@@ -105,6 +112,36 @@ class Playqueue(object):
         self.kodi_playlist_playback = False
         LOG.debug('Playlist cleared: %s', self)
 
+    def kodi_item_added(self, position):
+        """
+        Kodi added an item to its playlist at position
+        """
+        if self.kodi_items is None:
+            return
+        if position is None or position > len(self.kodi_items):
+            LOG.debug('Kodi playlist %s out of sync', self.playlistid)
+            self.kodi_items = None
+        else:
+            self.kodi_items.insert(position, None)
+
+    def kodi_item_removed(self, position):
+        """
+        Kodi removed the item at position from its playlist
+        """
+        if self.kodi_items is None:
+            return
+        try:
+            del self.kodi_items[position]
+        except IndexError:
+            LOG.debug('Kodi playlist %s out of sync', self.playlistid)
+            self.kodi_items = None
+
+    def kodi_items_cleared(self):
+        """
+        Kodi cleared its playlist
+        """
+        self.kodi_items = []
+
     def position_from_plex_id(self, plex_id):
         """
         Returns the position [int] for the very first item with plex_id [int]
@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from logging import getLogger
+from time import time
+import threading
+import queue
 import requests
 
 from .kodi_db import KodiVideoDB, KodiMusicDB, KodiTextureDB
@@ -15,6 +18,16 @@ requests.packages.urllib3.disable_warnings()
 # download is successful
 TIMEOUT = (35.1, 35.1)
 BATCH_SIZE = 500
+# Max. number of concurrent connections to Kodi's webserver
+MAX_CACHING_THREADS = 16
+# Update the image caching status in the PKC settings every x seconds
+STATUS_INTERVAL = 30
+# Give up on an url after Kodi refused the connection this many times
+MAX_RETRIES = 5
+
+# Shared by all threads, keeps connections to Kodi's webserver alive
+SESSION = None
+SESSION_LOCK = threading.Lock()
 
 
 def double_urlencode(text):
@@ -25,40 +38,136 @@ def double_urldecode(text):
     return utils.unquote(utils.unquote(text))
 
 
+def get_session():
+    """
+    Returns the requests session used for all calls to Kodi's webserver
+    """
+    global SESSION
+    with SESSION_LOCK:
+        if SESSION is None:
+            SESSION = requests.Session()
+            # Make sure that no proxy is used for our calls to Kodi's
+            # webserver at localhost. See
+            # https://github.com/croneter/PlexKodiConnect/issues/1732
+            SESSION.trust_env = False
+            SESSION.mount('http://', requests.adapters.HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=MAX_CACHING_THREADS))
+        return SESSION
+
+
+class Backoff(object):
+    """
+    Shared by all image caching threads. If Kodi's webserver refuses our
+    connections, ALL threads pause - for exponentially longer periods if
+    the errors keep coming. Every successful call shortens the pause again
+    """
+    MAX_EXPONENT = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exponent = -1
+        self._resume_at = 0.0
+
+    def wait(self, should_abort=None):
+        """
+        Blocks until we may contact Kodi's webserver again. Returns False if
+        we should abort instead
+        """
+        while True:
+            with self._lock:
+                delay = self._resume_at - time()
+            if delay <= 0:
+                return True
+            if (app.APP.monitor.waitForAbort(min(delay, 1.0)) or
+                    app.APP.stop_pkc or (should_abort and should_abort())):
+                return False
+
+    def failure(self):
+        """
+        Call if Kodi's webserver refused a connection. Returns the number of
+        seconds all threads will pause
+        """
+        with self._lock:
+            self._exponent = min(self._exponent + 1, self.MAX_EXPONENT)
+            delay = 2**self._exponent
+            self._resume_at = max(self._resume_at, time() + delay)
+        return delay
+
+    def success(self):
+        with self._lock:
+            if self._exponent >= 0:
+                self._exponent -= 1
+
+
+class CachingStats(object):
+    """
+    Thread-safe progress and throughput statistics for image caching
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.start = time()
+        self.cached = 0
+        self.failed = 0
+
+    def add(self, success):
+        with self._lock:
+            if success:
+                self.cached += 1
+            else:
+                self.failed += 1
+
+    @property
+    def rate(self):
+        try:
+            return self.cached / (time() - self.start)
+        except ZeroDivisionError:
+            return 0.0
+
+    def __str__(self):
+        return '%s images cached, %s failed, %.1f images/s' % (
+            self.cached, self.failed, self.rate)
+
+
 class ImageCachingThread(backgroundthread.KillableThread):
     def __init__(self):
         super(ImageCachingThread, self).__init__()
         self.suspend_points = [(self, '_suspended')]
         if not utils.settings('imageSyncDuringPlayback') == 'true':
             self.suspend_points.append((app.APP, 'is_playing_video'))
+        self.thread_number = min(
+            max(int(utils.settings('imageCachingThreads') or 1), 1),
+            MAX_CACHING_THREADS)
+        self.backoff = Backoff()
+        self.stats = CachingStats()
+        self.last_status_update = time()
 
     def should_suspend(self):
         return any(getattr(obj, attrib) for obj, attrib in self.suspend_points)
 
+    def _should_stop(self):
+        return self.should_suspend() or self.should_cancel()
+
     @staticmethod
     def _url_generator(kind, kodi_type):
         """
-        Main goal is to close DB connection between calls
+        Main goal is to close DB connection between calls. Checks an entire
+        batch of art urls against the Kodi texture cache at once
         """
         offset = 0
-        i = 0
         while True:
-            batch = []
             with kind(texture_db=True) as kodidb:
                 texture_db = KodiTextureDB(kodiconn=kodidb.kodiconn,
                                            artconn=kodidb.artconn,
                                            lock=False)
-                for i, url in enumerate(kodidb.artwork_generator(kodi_type,
-                                                                 BATCH_SIZE,
-                                                                 offset)):
-                    if texture_db.url_not_yet_cached(url):
-                        batch.append(url)
-                        if len(batch) == BATCH_SIZE:
-                            break
-            offset += i
+                urls = list(kodidb.artwork_generator(kodi_type,
+                                                     BATCH_SIZE,
+                                                     offset))
+                batch = texture_db.urls_not_yet_cached(urls)
+            offset += len(urls)
             for url in batch:
                 yield url
-            if i + 1 < BATCH_SIZE:
+            if len(urls) < BATCH_SIZE:
                 break
 
     def run(self):
@@ -70,18 +179,70 @@ class ImageCachingThread(backgroundthread.KillableThread):
             utils.ERROR()
         finally:
             app.APP.deregister_caching_thread(self)
+            LOG.info('Image caching stats: %s', self.stats)
             LOG.info("---===### Stopped ImageCachingThread ###===---")
 
+    def _worker(self, url_queue):
+        """
+        Caches the urls from url_queue until it gets the sentinel None
+        """
+        while True:
+            url = url_queue.get()
+            try:
+                if url is None:
+                    break
+                if self._should_stop():
+                    # Drain the queue so we don't block _loop()
+                    continue
+                self.stats.add(cache_url(url,
+                                         self._should_stop,
+                                         backoff=self.backoff))
+            except Exception:
+                utils.ERROR()
+            finally:
+                url_queue.task_done()
+
+    def _update_status(self):
+        if time() - self.last_status_update < STATUS_INTERVAL:
+            return
+        self.last_status_update = time()
+        LOG.debug('Image caching progress: %s', self.stats)
+        # "x images cached (y per second)"
+        utils.settings('plex_status_image_caching',
+                       value=utils.lang(39724).format(self.stats.cached,
+                                                      self.stats.rate))
+
     def _loop(self):
+        url_queue = queue.Queue(maxsize=2 * self.thread_number)
+        workers = [threading.Thread(target=self._worker,
+                                    args=(url_queue, ),
+                                    name='ImageCachingWorker-%s' % i)
+                   for i in range(self.thread_number)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        try:
+            return self._fill_queue(url_queue)
+        finally:
+            for _ in workers:
+                url_queue.put(None)
+            for worker in workers:
+                worker.join()
+
+    def _fill_queue(self, url_queue):
         kinds = [KodiVideoDB]
         if app.SYNC.enable_music:
             kinds.append(KodiMusicDB)
         for kind in kinds:
             for kodi_type in ('poster', 'fanart'):
                 for url in self._url_generator(kind, kodi_type):
-                    if self.should_suspend() or self.should_cancel():
+                    if self._should_stop():
                         return False
-                    cache_url(url, self.should_suspend)
+                    url_queue.put(url)
+                    self._update_status()
+        url_queue.join()
+        if self._should_stop():
+            return False
         # Toggles Image caching completed to Yes
         utils.settings('plex_status_image_caching', value=utils.lang(107))
         return True
@@ -94,15 +255,21 @@ class ImageCachingThread(backgroundthread.KillableThread):
                 break
 
 
-def cache_url(url, should_suspend=None):
+def cache_url(url, should_suspend=None, backoff=None):
+    """
+    Triggers Kodi to download and cache the image at url by calling Kodi's
+    webserver. Pass a shared Backoff instance if several threads cache
+    images concurrently. Returns True if Kodi accepted the request
+    """
     url = double_urlencode(url)
-    sleeptime = 0
+    session = get_session()
+    backoff = backoff or Backoff()
+    retries = 0
     while True:
+        if not backoff.wait(should_suspend):
+            return False
         try:
-            # Make sure that no proxy is used for our calls to Kodi's webserver
-            # at localhost See
-            # https://github.com/croneter/PlexKodiConnect/issues/1732
-            requests.head(
+            session.head(
                 url=f'http://{app.CONN.webserver_username}:{app.CONN.webserver_password}@{app.CONN.webserver_host}:{app.CONN.webserver_port}/image/image://{url}',
                 auth=(app.CONN.webserver_username,
                       app.CONN.webserver_password),
@@ -111,29 +278,29 @@ def cache_url(url, should_suspend=None):
         except requests.Timeout:
             # We don't need the result, only trigger Kodi to start the
             # download. All is well
-            break
+            pass
         except requests.ConnectionError:
             if app.APP.stop_pkc or (should_suspend and should_suspend()):
-                break
+                return False
             # Server thinks its a DOS attack, ('error 10053')
             # Wait before trying again
             # OR: Kodi refuses Webserver connection (no password set)
-            if sleeptime > 5:
+            if retries >= MAX_RETRIES:
                 LOG.error('Repeatedly got ConnectionError for url %s',
                           double_urldecode(url))
-                break
+                return False
+            retries += 1
             LOG.debug('Were trying too hard to download art, server '
                       'over-loaded. Sleep %s seconds before trying '
                       'again to download %s',
-                      2**sleeptime, double_urldecode(url))
-            app.APP.monitor.waitForAbort((2**sleeptime))
-            sleeptime += 1
+                      backoff.failure(), double_urldecode(url))
             continue
         except Exception as err:
-            LOG.error('Unknown exception for url %s: %s'.
+            LOG.error('Unknown exception for url %s: %s',
                       double_urldecode(url), err)
             import traceback
             LOG.error("Traceback:\n%s", traceback.format_exc())
-            break
+            return False
         # We did not even get a timeout
-        break
+        backoff.success()
+        return True
@@ -23,6 +23,7 @@ class KillableThread(threading.Thread):
         self._suspension_reached = threading.Event()
         self._is_not_asleep = threading.Event()
         self._is_not_asleep.set()
+        self._woken_up = threading.Event()
         self.suspension_timeout = None
         super(KillableThread, self).__init__(group, target, name, args, kwargs)
 
@@ -99,6 +100,29 @@ class KillableThread(threading.Thread):
         self._is_not_asleep.wait(timeout)
         self._is_not_asleep.set()
 
+    def wait_for_wake_up(self, timeout):
+        """
+        Only call from the current thread. Like sleep(), but will also
+        unblock immediately once another thread called wake_up() - even if
+        wake_up() was called shortly before this method. Returns True if the
+        thread was woken up by wake_up()
+        """
+        self._is_not_asleep.clear()
+        if not self._woken_up.is_set():
+            self._is_not_asleep.wait(timeout)
+        self._is_not_asleep.set()
+        woken_up = self._woken_up.is_set()
+        self._woken_up.clear()
+        return woken_up
+
+    def wake_up(self):
+        """
+        Call from another thread to wake up the current thread if it is
+        waiting in wait_for_wake_up(), e.g. because there is new work
+        """
+        self._woken_up.set()
+        self._is_not_asleep.set()
+
     def is_asleep(self):
         """
         Check from another thread whether the current thread is asleep
@@ -315,21 +339,61 @@ class FunctionAsTask(Task):
 
 
 class MutablePriorityQueue(queue.PriorityQueue):
+    """
+    Queue for Tasks that returns the Task with the highest task.priority
+    first (see Task.__lt__). Use reprioritize() to change the priority of a
+    Task that has already been queued.
+
+    Heap entries are lists [-priority, counter, task]. Changing a task's
+    priority invalidates its old entry (task set to None) and pushes a new
+    one, so put(), get() and reprioritize() are all O(log n)
+    """
+    def _init(self, maxsize):
+        self.queue = []
+        # {id(task): heap entry} for all valid entries
+        self._entries = {}
+        # Tie-breaker: first in, first out for tasks with the same priority
+        self._counter = 0
+
+    def _qsize(self):
+        return len(self._entries)
+
+    def _put(self, task):
+        try:
+            # Task has already been queued - only keep the new entry
+            self._entries.pop(id(task))[-1] = None
+        except KeyError:
+            pass
+        entry = [-task.priority, self._counter, task]
+        self._counter += 1
+        self._entries[id(task)] = entry
+        heapq.heappush(self.queue, entry)
+
     def _get(self):
-            self.queue.sort()
-            return heapq.heappop(self.queue)
+        while True:
+            task = heapq.heappop(self.queue)[-1]
+            if task is not None:
+                del self._entries[id(task)]
+                return task
+
+    def _drop_invalid_entries(self):
+        while self.queue and self.queue[0][-1] is None:
+            heapq.heappop(self.queue)
+
+    def reprioritize(self, task, priority):
+        """
+        Sets task.priority to priority and re-sorts task if it is queued
+        """
+        with self.mutex:
+            task.priority = priority
+            if id(task) in self._entries:
+                self._put(task)
 
     def lowest(self):
         """Return the lowest priority item in the queue (not reliable!)."""
-        self.mutex.acquire()
-        try:
-            lowest = self.queue and min(self.queue) or None
-        except Exception:
-            lowest = None
-            utils.ERROR(notify=True)
-        finally:
-            self.mutex.release()
-        return lowest
+        with self.mutex:
+            self._drop_invalid_entries()
+            return self.queue[0][-1] if self.queue else None
 
 
 class BackgroundWorker(object):
@@ -491,7 +555,7 @@ class BackgroundThreader(object):
         if lowest is None:
             return
 
-        qitem.priority = lowest - 1
+        self._queue.reprioritize(qitem, lowest - 1)
 
 
 class ThreaderManager(object):
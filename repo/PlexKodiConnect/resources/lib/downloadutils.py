@@ -109,6 +109,79 @@ class DownloadUtils(object):
             r = s.put(**kwargs)
         return r
 
+    def handleResponse(self, r, url, authenticate=True):
+        """
+        Processes the requests response r we got for url, see downloadUrl()
+        for the return values
+        """
+        if r.status_code == 204:
+            # No body in the response
+            # But read (empty) content to release connection back to pool
+            # (see requests: keep-alive documentation)
+            r.content
+            return True
+
+        elif r.status_code == 401:
+            if authenticate is False:
+                # Called when checking a connect - no need for rash action
+                return 401
+            r.encoding = 'utf-8'
+            LOG.warn('HTTP error 401 from PMS %s', url)
+            LOG.info(r.text)
+            if '401 Unauthorized' in r.text:
+                # Truly unauthorized
+                self.count_unauthorized += 1
+                if self.count_unauthorized >= self.unauthorized_attempts:
+                    LOG.warn('We seem to be truly unauthorized for PMS'
+                             ' %s ', url)
+                    # Unauthorized access, user no longer has access
+                    app.ACCOUNT.log_out()
+                    utils.dialog('notification',
+                                 utils.lang(29999),
+                                 utils.lang(30017),
+                                 icon='{error}')
+            else:
+                # there might be other 401 where e.g. PMS under strain
+                LOG.info('PMS might only be under strain')
+            return 401
+
+        elif r.status_code in (200, 201):
+            # 200: OK
+            # 201: Created
+            try:
+                # xml response
+                r = utils.etree.fromstring(r.content)
+                return r
+            except Exception:
+                r.encoding = 'utf-8'
+                if r.text == '':
+                    # Answer does not contain a body
+                    return True
+                try:
+                    # UNICODE - JSON object
+                    r = r.json()
+                    return r
+                except Exception:
+                    if '200 OK' in r.text:
+                        # Received fucked up OK from PMS on playstate
+                        # update
+                        pass
+                    else:
+                        LOG.warn("Unable to convert the response for: "
+                                 "%s", url)
+                        LOG.warn("Received headers were: %s", r.headers)
+                        LOG.warn('Received text: %s', r.text)
+                    return True
+        elif r.status_code == 403:
+            # E.g. deleting a PMS item
+            LOG.warn('PMS sent 403: Forbidden error for url %s', url)
+            return
+        else:
+            r.encoding = 'utf-8'
+            LOG.warn('Unknown answer from PMS %s with status code %s: %s',
+                     url, r.status_code, r.text)
+            return True
+
     def downloadUrl(self, url, action_type="GET", postBody=None,
                     parameters=None, authenticate=True, headerOptions=None,
                     verifySSL=True, timeout=None, return_response=False,
@@ -227,73 +300,7 @@ class DownloadUtils(object):
                 # return the entire response object
                 return r
 
-            elif r.status_code == 204:
-                # No body in the response
-                # But read (empty) content to release connection back to pool
-                # (see requests: keep-alive documentation)
-                r.content
-                return True
-
-            elif r.status_code == 401:
-                if authenticate is False:
-                    # Called when checking a connect - no need for rash action
-                    return 401
-                r.encoding = 'utf-8'
-                LOG.warn('HTTP error 401 from PMS %s', url)
-                LOG.info(r.text)
-                if '401 Unauthorized' in r.text:
-                    # Truly unauthorized
-                    self.count_unauthorized += 1
-                    if self.count_unauthorized >= self.unauthorized_attempts:
-                        LOG.warn('We seem to be truly unauthorized for PMS'
-                                 ' %s ', url)
-                        # Unauthorized access, user no longer has access
-                        app.ACCOUNT.log_out()
-                        utils.dialog('notification',
-                                     utils.lang(29999),
-                                     utils.lang(30017),
-                                     icon='{error}')
-                else:
-                    # there might be other 401 where e.g. PMS under strain
-                    LOG.info('PMS might only be under strain')
-                return 401
-
-            elif r.status_code in (200, 201):
-                # 200: OK
-                # 201: Created
-                try:
-                    # xml response
-                    r = utils.etree.fromstring(r.content)
-                    return r
-                except Exception:
-                    r.encoding = 'utf-8'
-                    if r.text == '':
-                        # Answer does not contain a body
-                        return True
-                    try:
-                        # UNICODE - JSON object
-                        r = r.json()
-                        return r
-                    except Exception:
-                        if '200 OK' in r.text:
-                            # Received fucked up OK from PMS on playstate
-                            # update
-                            pass
-                        else:
-                            LOG.warn("Unable to convert the response for: "
-                                     "%s", url)
-                            LOG.warn("Received headers were: %s", r.headers)
-                            LOG.warn('Received text: %s', r.text)
-                        return True
-            elif r.status_code == 403:
-                # E.g. deleting a PMS item
-                LOG.warn('PMS sent 403: Forbidden error for url %s', url)
-                return
-            else:
-                r.encoding = 'utf-8'
-                LOG.warn('Unknown answer from PMS %s with status code %s: %s',
-                         url, r.status_code, r.text)
-                return True
+            return self.handleResponse(r, url, authenticate)
 
         finally:
             if not success and authenticate:
@@ -7,6 +7,7 @@ e.g. plugin://... calls. Hence be careful to only rely on window variables.
 from logging import getLogger
 import sys
 import copy
+import time
 import xml.etree.ElementTree as etree
 
 import xbmc
@@ -20,7 +21,7 @@ from .plex_api import API, mass_api
 from . import plex_functions as PF
 from . import variables as v
 # Be careful - your using app in another Python instance!
-from . import app, widgets
+from . import app, widgets, response_cache
 from .library_sync.nodes import NODE_TYPES
 
 
@@ -245,13 +246,26 @@ def show_listing(xml, plex_type=None, section_id=None, synched=True, key=None):
     if xml.get('viewGroup') == 'secondary':
         # Need to chain keys for navigation
         widgets.KEY = key
-    # Process all items to show
+    # Process all items to show - and time every phase
+    timings = [time.time()]
     all_items = mass_api(xml)
+    timings.append(time.time())
+    widgets.prefetch_kodi_details(all_items)
+    timings.append(time.time())
     all_items = [widgets.generate_item(api) for api in all_items]
+    timings.append(time.time())
     all_items = [widgets.prepare_listitem(item) for item in all_items]
+    timings.append(time.time())
     # fill that listing...
     all_items = [widgets.create_listitem(item) for item in all_items]
+    timings.append(time.time())
     xbmcplugin.addDirectoryItems(int(sys.argv[1]), all_items, len(all_items))
+    timings.append(time.time())
+    LOG.debug('show_listing: %s items took %.3fs - Plex DB lookup %.3fs, '
+              'Kodi details %.3fs, generate items %.3fs, prepare listitems '
+              '%.3fs, create listitems %.3fs, add to Kodi %.3fs',
+              len(all_items), timings[-1] - timings[0],
+              *[end - start for start, end in zip(timings, timings[1:])])
     # end directory listing
     xbmcplugin.addSortMethod(int(sys.argv[1]), xbmcplugin.SORT_METHOD_UNSORTED)
     xbmcplugin.endOfDirectory(handle=int(sys.argv[1]))
@@ -407,7 +421,7 @@ def hub(content_type):
     if not _wait_for_auth():
         return xbmcplugin.endOfDirectory(int(sys.argv[1]), False)
     app.init(entrypoint=True)
-    xml = PF.get_plex_hub()
+    xml = response_cache.download('{server}/hubs')
     try:
         xml.attrib
     except AttributeError:
@@ -499,7 +513,7 @@ def browse_plex(key=None, plex_type=None, section_id=None, synched=True,
             return
         prompt = prompt.strip()
         args['query'] = prompt
-    xml = DU().downloadUrl(utils.extend_url('{server}%s' % key, args))
+    xml = response_cache.download(utils.extend_url('{server}%s' % key, args))
     try:
         xml[0].attrib
     except (TypeError, IndexError, AttributeError):
@@ -75,6 +75,8 @@ class ItemBase(object):
         """
         try:
             if exc_type:
+                # Our changes will be rolled back - ids we cached are invalid
+                self.kodidb.clear_cache()
                 # re-raise any exception
                 return False
             self.plexconn.commit()
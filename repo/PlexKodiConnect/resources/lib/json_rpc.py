@@ -35,6 +35,8 @@ class JsonRPC(object):
     """
     id_ = 1
     version = "2.0"
+    # Number of JSON RPC calls to Kodi since startup (of all threads)
+    calls = 0
 
     def __init__(self, method, **kwargs):
         """
@@ -60,6 +62,7 @@ class JsonRPC(object):
         Pass any params as a dict. Will return Kodi's answer as a dict.
         """
         self.params = params
+        JsonRPC.calls += 1
         return loads(executeJSONRPC(self._query()))
 
 
@@ -290,9 +293,11 @@ def input_sendtext(text):
     return JsonRPC("Input.SendText").execute({'test': text, 'done': False})
 
 
-def playlist_get_items(playlistid):
+def playlist_get_items(playlistid, start=None, end=None):
     """
         playlistid:    [int] id of the Kodi playlist
+        start, end:    [int] optional: only get the items from position start
+                       up to, but excluding, position end
 
     Returns a list of Kodi playlist items as dicts with the keys specified in
     properties. Or an empty list if unsuccessful. Example:
@@ -304,10 +309,13 @@ def playlist_get_items(playlistid):
             u'id': 3,                   # IF possible! Else key missing
             u'label': u'3 Idiots'}]
     """
-    reply = JsonRPC('Playlist.GetItems').execute({
+    params = {
         'playlistid': playlistid,
         'properties': ['title', 'file']
-    })
+    }
+    if start is not None:
+        params['limits'] = {'start': start, 'end': end}
+    reply = JsonRPC('Playlist.GetItems').execute(params)
     try:
         reply = reply['result']['items']
     except KeyError:
@@ -315,6 +323,21 @@ def playlist_get_items(playlistid):
     return reply
 
 
+def playlist_size(playlistid):
+    """
+    Returns the number of items in the Kodi playlist playlistid or None if
+    unsuccessful
+    """
+    reply = JsonRPC('Playlist.GetProperties').execute({
+        'playlistid': playlistid,
+        'properties': ['size']
+    })
+    try:
+        return reply['result']['size']
+    except KeyError:
+        return None
+
+
 def playlist_add(playlistid, item):
     """
     Adds an item to the Kodi playlist with id playlistid. item is either the
@@ -624,6 +647,44 @@ def item_details(kodi_id, kodi_type):
     json, fields = JSON_FROM_KODITYPE[kodi_type]
     ret = JsonRPC(json).execute({'%sid' % kodi_type: kodi_id,
                                 'properties': fields})
+    return _details_from_answer(ret, kodi_type)
+
+
+def items_details(kodi_items):
+    '''
+    Pass in a list of (kodi_id, kodi_type) tuples. Returns a dict
+    {(kodi_id, kodi_type): Kodi item dict} for all these items using one
+    single batched JSON RPC call, grouped by kodi_type. The item dict is
+    empty if Kodi did not return any details for an item
+    '''
+    kodi_items = sorted(set(kodi_items), key=lambda x: (x[1], x[0]))
+    if not kodi_items:
+        return {}
+    query = []
+    for id_, (kodi_id, kodi_type) in enumerate(kodi_items):
+        json, fields = JSON_FROM_KODITYPE[kodi_type]
+        query.append({
+            'jsonrpc': JsonRPC.version,
+            'id': id_,
+            'method': json,
+            'params': {'%sid' % kodi_type: kodi_id, 'properties': fields}
+        })
+    JsonRPC.calls += 1
+    answer = loads(executeJSONRPC(dumps(query)))
+    if not isinstance(answer, list):
+        # Batch request failed - fall back to one request per item
+        return {x: item_details(*x) for x in kodi_items}
+    details = {x: {} for x in kodi_items}
+    for ret in answer:
+        try:
+            kodi_item = kodi_items[ret['id']]
+        except (KeyError, IndexError, TypeError):
+            continue
+        details[kodi_item] = _details_from_answer(ret, kodi_item[1])
+    return details
+
+
+def _details_from_answer(ret, kodi_type):
     try:
         ret = ret['result']['%sdetails' % kodi_type]
     except (KeyError, TypeError):
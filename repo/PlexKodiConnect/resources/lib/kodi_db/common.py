@@ -1,12 +1,94 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from threading import Lock
+from collections import OrderedDict
 
 from .. import db, path_ops
 
 KODIDB_LOCK = Lock()
 # Names of tables we generally leave untouched and e.g. don't wipe
 UNTOUCHED_TABLES = ('version', 'versiontagscan')
+# SQLite allows a maximum of 999 variables "?" per query
+SQLITE_MAX_VARIABLES = 999
+
+
+def chunks(iterable, size=SQLITE_MAX_VARIABLES):
+    """
+    Splits iterable into lists of at most size elements, e.g. to not exceed
+    the SQLite limit for variables per query
+    """
+    lst = list(iterable)
+    for i in range(0, len(lst), size):
+        yield lst[i:i + size]
+
+
+class LRUCache(object):
+    """
+    Dict-like cache that holds at most maxsize items. Will drop the least
+    recently used item if a new one is added to a full cache
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, key):
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            del self[next(iter(self._data))]
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def items(self):
+        return self._data.items()
+
+    def clear(self):
+        self._data.clear()
+
+
+class IdCache(LRUCache):
+    """
+    LRUCache for {name: entry_id} that can also forget entries by their
+    entry_id without looking at every cached name
+    """
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self._names = {}
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self._names.pop(self._data[key], None)
+        self._names[value] = key
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._names.pop(self._data[key], None)
+        super().__delitem__(key)
+
+    def clear(self):
+        super().clear()
+        self._names.clear()
+
+    def forget_ids(self, entry_ids):
+        """
+        Removes all entries with an id in entry_ids from the cache
+        """
+        for entry_id in entry_ids:
+            try:
+                del self[self._names[entry_id]]
+            except KeyError:
+                pass
 
 
 class KodiDBBase(object):
@@ -38,6 +120,8 @@ class KodiDBBase(object):
     def __exit__(self, e_typ, e_val, trcbak):
         try:
             if e_typ:
+                # Our changes will be rolled back
+                self.clear_cache()
                 # re-raise any exception
                 return False
             self.kodiconn.commit()
@@ -50,6 +134,13 @@ class KodiDBBase(object):
             if self.lock:
                 KODIDB_LOCK.release()
 
+    def clear_cache(self):
+        """
+        Invalidates any ids we cached from the Kodi DB, e.g. because our
+        transaction has been rolled back
+        """
+        pass
+
     def art_urls(self, kodi_id, kodi_type):
         return (x[0] for x in
                 self.cursor.execute('SELECT url FROM art WHERE media_id = ? AND media_type = ?',
@@ -13,3 +13,16 @@ class KodiTextureDB(common.KodiDBBase):
         self.artcursor.execute('SELECT url FROM texture WHERE url = ? LIMIT 1',
                                (url, ))
         return self.artcursor.fetchone() is None
+
+    def urls_not_yet_cached(self, urls):
+        """
+        Returns the list of all urls that have not yet been cached to the
+        Kodi texture cache, in the same order as urls. Uses one query for
+        up to common.SQLITE_MAX_VARIABLES urls instead of one per url
+        """
+        cached = set()
+        for chunk in common.chunks(set(urls)):
+            query = 'SELECT url FROM texture WHERE url IN (%s)' % \
+                ','.join('?' * len(chunk))
+            cached.update(x[0] for x in self.artcursor.execute(query, chunk))
+        return [url for url in urls if url not in cached]
@@ -10,10 +10,30 @@ LOG = getLogger('PLEX.kodi_db.video')
 MOVIE_PATH = 'plugin://%s.movies/' % v.ADDON_ID
 SHOW_PATH = 'plugin://%s.tvshows/' % v.ADDON_ID
 
+# Max. number of actors (and their artwork status) or of genres, studios, etc.
+# to cache per connection
+ACTOR_CACHE_SIZE = 20000
+# Kodi looks up genre, studio, country and tag names with COLLATE NOCASE,
+# which only folds the ASCII characters A-Z
+NOCASE = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ',
+                       'abcdefghijklmnopqrstuvwxyz')
+
 
 class KodiVideoDB(common.KodiDBBase):
     db_kind = 'video'
 
+    def __init__(self, *args, **kwargs):
+        super(KodiVideoDB, self).__init__(*args, **kwargs)
+        # Cache {table: {name: id}} for the tables genre, studio, country, tag
+        # and actor. Only valid as long as we're using the same connection
+        self._name_ids = {'actor': common.IdCache(ACTOR_CACHE_SIZE)}
+        # actor_ids that we know to have an artwork url
+        self._actors_with_art = common.LRUCache(ACTOR_CACHE_SIZE)
+
+    def clear_cache(self):
+        self._name_ids = {'actor': common.IdCache(ACTOR_CACHE_SIZE)}
+        self._actors_with_art.clear()
+
     @db.catch_operationalerrors
     def create_kodi_db_indicees(self):
         """
@@ -22,6 +42,9 @@ class KodiVideoDB(common.KodiDBBase):
         commands = (
             'CREATE UNIQUE INDEX IF NOT EXISTS ix_actor_2 ON actor (actor_id);',
             'CREATE UNIQUE INDEX IF NOT EXISTS ix_files_2 ON files (idFile);',
+            # Kodi's ix_actor_1 on actor(name) already covers looking up
+            # actor_ids by name. Drop the index previous PKC versions created
+            'DROP INDEX IF EXISTS ix_actor_3;',
         )
         for cmd in commands:
             self.cursor.execute(cmd)
@@ -218,59 +241,91 @@ class KodiVideoDB(common.KodiDBBase):
                 '''
                 self.cursor.execute(query, (path_id, MOVIE_PATH, SHOW_PATH))
 
-    @db.catch_operationalerrors
-    def _modify_link_and_table(self, kodi_id, kodi_type, entries, link_table,
-                               table, key, first_id=None):
-        first_id = first_id if first_id is not None else 1
+    def _entry_ids(self, table, key, names):
+        """
+        Returns a list with the ids of all names [list of unicode] in table,
+        in the same order. Creates new entries in table for names that do not
+        exist yet. Names we did not yet cache are looked up with one query
+        """
+        if table not in self._name_ids:
+            self._name_ids[table] = common.IdCache(ACTOR_CACHE_SIZE)
+        cache = self._name_ids[table]
+        missing = set(x.translate(NOCASE) for x in names
+                      if x.translate(NOCASE) not in cache)
+        for chunk in common.chunks(missing):
+            query = 'SELECT %s, name FROM %s WHERE name COLLATE NOCASE IN (%s)' \
+                % (key, table, ','.join('?' * len(chunk)))
+            for entry_id, name in self.cursor.execute(query, chunk):
+                name = name.translate(NOCASE)
+                if name not in cache:
+                    cache[name] = entry_id
         entry_ids = []
-        for entry in entries:
-            self.cursor.execute('''
-                SELECT %s FROM %s WHERE name = ? COLLATE NOCASE LIMIT 1
-            ''' % (key, table), (entry, ))
+        for name in names:
             try:
-                entry_id = self.cursor.fetchone()[0]
-            except TypeError:
+                entry_ids.append(cache[name.translate(NOCASE)])
+            except KeyError:
                 self.cursor.execute('INSERT INTO %s(name) VALUES(?)' % table,
-                                    (entry, ))
-                entry_id = self.cursor.lastrowid
-            finally:
-                entry_ids.append(entry_id)
-        # Now process the ids obtained from the names
+                                    (name, ))
+                cache[name.translate(NOCASE)] = self.cursor.lastrowid
+                entry_ids.append(self.cursor.lastrowid)
+        return entry_ids
+
+    def _forget_entry_ids(self, table, entry_ids):
+        """
+        Removes entry_ids that we just deleted from table from our name cache
+        """
+        if table in self._name_ids:
+            self._name_ids[table].forget_ids(entry_ids)
+        if table == 'actor':
+            for entry_id in entry_ids:
+                if entry_id in self._actors_with_art:
+                    del self._actors_with_art[entry_id]
+
+    def _orphaned_ids(self, entry_ids, key, link_tables):
+        """
+        Returns the set of entry_ids that are not referenced anymore in any of
+        the link_tables
+        """
+        orphans = set(entry_ids)
+        for link_table in link_tables:
+            for chunk in common.chunks(orphans):
+                query = 'SELECT DISTINCT %s FROM %s WHERE %s IN (%s)' \
+                    % (key, link_table, key, ','.join('?' * len(chunk)))
+                orphans.difference_update(x[0] for x in
+                                          self.cursor.execute(query, chunk))
+        return orphans
+
+    @db.catch_operationalerrors
+    def _modify_link_and_table(self, kodi_id, kodi_type, entries, link_table,
+                               table, key, first_id=None):
+        entry_ids = set(self._entry_ids(table, key, entries))
         # Get the existing, old entries
-        outdated_entries = []
-        for entry_id in self.cursor.execute('SELECT %s FROM %s WHERE media_id = ? AND media_type = ?'
-                                            % (key, link_table), (kodi_id, kodi_type)):
-            try:
-                entry_ids.remove(entry_id[0])
-            except ValueError:
-                outdated_entries.append(entry_id[0])
+        old_ids = set(x[0] for x in self.cursor.execute(
+            'SELECT %s FROM %s WHERE media_id = ? AND media_type = ?'
+            % (key, link_table), (kodi_id, kodi_type)))
+        outdated_entries = old_ids - entry_ids
         # Add all new entries that haven't already been added
-        for entry_id in entry_ids:
-            try:
-                self.cursor.execute('INSERT INTO %s VALUES (?, ?, ?)' % link_table,
-                                    (entry_id, kodi_id, kodi_type))
-            except Exception as exc:
-                # Bug with e.g. Nvidia Shield, Android 11 and Experience 9
-                # Directly catching sqlite3.IntegrityError here does NOT
-                # work and can even lead to Kodi crashing
-                # https://github.com/croneter/PlexKodiConnect/issues/1796
-                # https://github.com/croneter/PlexKodiConnect/issues/1777
-                if exc.args and 'UNIQUE constraint failed:' not in exc.args[0]:
-                    raise
-                LOG.info('IntegrityError 2: skipping entry %s for table %s',
-                         entry_id, link_table)
+        # Use OR IGNORE: catching sqlite3.IntegrityError does NOT work with
+        # e.g. Nvidia Shield, Android 11 and Experience 9 and can even lead to
+        # Kodi crashing
+        # https://github.com/croneter/PlexKodiConnect/issues/1796
+        # https://github.com/croneter/PlexKodiConnect/issues/1777
+        self.cursor.executemany(
+            'INSERT OR IGNORE INTO %s VALUES (?, ?, ?)' % link_table,
+            [(x, kodi_id, kodi_type) for x in entry_ids - old_ids])
+        if not outdated_entries:
+            return
         # Delete all outdated references in the link table. Also check whether
         # we need to delete orphaned entries in the master table
-        for entry_id in outdated_entries:
-            self.cursor.execute('''
-                DELETE FROM %s WHERE %s = ? AND media_id = ? AND media_type = ?
-            ''' % (link_table, key), (entry_id, kodi_id, kodi_type))
-            self.cursor.execute('SELECT %s FROM %s WHERE %s = ?' % (key, link_table, key),
-                                (entry_id, ))
-            if self.cursor.fetchone() is None:
-                # Delete in the original table because entry is now orphaned
-                self.cursor.execute('DELETE FROM %s WHERE %s = ?' % (table, key),
-                                    (entry_id, ))
+        self.cursor.executemany(
+            'DELETE FROM %s WHERE %s = ? AND media_id = ? AND media_type = ?'
+            % (link_table, key),
+            [(x, kodi_id, kodi_type) for x in outdated_entries])
+        orphans = self._orphaned_ids(outdated_entries, key, (link_table, ))
+        # Delete in the original table because entries are now orphaned
+        self.cursor.executemany('DELETE FROM %s WHERE %s = ?' % (table, key),
+                                [(x, ) for x in orphans])
+        self._forget_entry_ids(table, orphans)
 
     def modify_countries(self, kodi_id, kodi_type, countries=None):
         """
@@ -332,47 +387,32 @@ class KodiVideoDB(common.KodiDBBase):
     @db.catch_operationalerrors
     def _add_people_kind(self, kodi_id, kodi_type, kind, people_list):
         # Save new people to Kodi DB by iterating over the remaining entries
+        # Make sure the person entries in table actor exist
+        actor_ids = self._actor_ids(people_list)
+        # Link the people with the media element. Use OR IGNORE: with Kodi,
+        # an actor may have only one role, unlike Plex, and Kodi may have
+        # only one person assigned to a role. Catching sqlite3.IntegrityError
+        # does NOT work with e.g. Nvidia Shield, Android 11 and Experience 9
+        # and can even lead to Kodi crashing
+        # https://github.com/croneter/PlexKodiConnect/issues/1796
+        # https://github.com/croneter/PlexKodiConnect/issues/1777
         if kind == 'actor':
             for person in people_list:
-                # Make sure the person entry in table actor exists
-                actor_id, new = self._get_actor_id(person[0],
-                                                   art_url=person[1])
+                actor_id, new = actor_ids[person[0]]
                 if not new and person[1]:
                     # Person might have shown up as a director or writer first
                     # WITHOUT an art url from the Plex side!
                     # Check here if we need to set the actor's art url
                     self._check_actor_art(actor_id, person[1])
-                # Link the person with the media element
-                try:
-                    self.cursor.execute('INSERT INTO actor_link VALUES (?, ?, ?, ?, ?)',
-                                        (actor_id, kodi_id, kodi_type,
-                                         person[2], person[3]))
-                except Exception as exc:
-                    # With Kodi, an actor may have only one role, unlike Plex
-                    # Bug with e.g. Nvidia Shield, Android 11 and Experience 9
-                    # Directly catching sqlite3.IntegrityError here does NOT
-                    # work and can even lead to Kodi crashing
-                    # https://github.com/croneter/PlexKodiConnect/issues/1796
-                    # https://github.com/croneter/PlexKodiConnect/issues/1777
-                    if exc.args and 'UNIQUE constraint failed:' not in exc.args[0]:
-                        raise
+            self.cursor.executemany(
+                'INSERT OR IGNORE INTO actor_link VALUES (?, ?, ?, ?, ?)',
+                [(actor_ids[x[0]][0], kodi_id, kodi_type, x[2], x[3])
+                 for x in people_list])
         else:
-            for person in people_list:
-                # Make sure the person entry in table actor exists:
-                actor_id, _ = self._get_actor_id(person[0])
-                # Link the person with the media element
-                try:
-                    self.cursor.execute('INSERT INTO %s_link VALUES (?, ?, ?)' % kind,
-                                        (actor_id, kodi_id, kodi_type))
-                except Exception as exc:
-                    # Again, Kodi may have only one person assigned to a role
-                    # Bug with e.g. Nvidia Shield, Android 11 and Experience 9
-                    # Directly catching sqlite3.IntegrityError here does NOT
-                    # work and can even lead to Kodi crashing
-                    # https://github.com/croneter/PlexKodiConnect/issues/1796
-                    # https://github.com/croneter/PlexKodiConnect/issues/1777
-                    if exc.args and 'UNIQUE constraint failed:' not in exc.args[0]:
-                        raise
+            self.cursor.executemany(
+                'INSERT OR IGNORE INTO %s_link VALUES (?, ?, ?)' % kind,
+                [(actor_ids[x[0]][0], kodi_id, kodi_type)
+                 for x in people_list])
 
     def modify_people(self, kodi_id, kodi_type, people=None):
         """
@@ -409,69 +449,91 @@ class KodiVideoDB(common.KodiDBBase):
         self.cursor.execute(query, (kodi_id, kodi_type))
         old_people = self.cursor.fetchall()
         # Determine which people we need to save or delete
-        outdated_people = []
+        outdated_people = set()
         for person in old_people:
             try:
                 people_list.remove(person[1:])
             except ValueError:
-                outdated_people.append(person)
-        # Get rid of old entries
-        query = '''
-            DELETE FROM %s_link
-            WHERE actor_id = ? AND media_id = ? AND media_type = ?
-        ''' % kind
-        query_actor_check = 'SELECT actor_id FROM %s_link WHERE actor_id = ?'
-        query_actor_delete = 'DELETE FROM actor WHERE actor_id = ?'
-        for person in outdated_people:
-            # Delete the outdated entry
-            self.cursor.execute(query, (person[0], kodi_id, kodi_type))
+                outdated_people.add(person[0])
+        if outdated_people:
+            # Get rid of old entries
+            self.cursor.executemany('''
+                DELETE FROM %s_link
+                WHERE actor_id = ? AND media_id = ? AND media_type = ?
+            ''' % kind, [(x, kodi_id, kodi_type) for x in outdated_people])
             # Do we now have orphaned entries?
-            for person_kind in ('actor', 'writer', 'director'):
-                self.cursor.execute(query_actor_check % person_kind,
-                                    (person[0],))
-                if self.cursor.fetchone() is not None:
-                    break
-            else:
-                # person entry in actor table is now orphaned
-                # Delete the person from actor table
-                self.cursor.execute(query_actor_delete, (person[0],))
-                if kind == 'actor':
+            orphans = self._orphaned_ids(outdated_people,
+                                         'actor_id',
+                                         ('actor_link',
+                                          'writer_link',
+                                          'director_link'))
+            # Delete the people from actor table
+            self.cursor.executemany('DELETE FROM actor WHERE actor_id = ?',
+                                    [(x, ) for x in orphans])
+            self._forget_entry_ids('actor', orphans)
+            if kind == 'actor':
+                for actor_id in orphans:
                     # Delete any associated artwork
-                    self.delete_artwork(person[0], 'actor')
+                    self.delete_artwork(actor_id, 'actor')
         # Save new people to Kodi DB by iterating over the remaining entries
         self._add_people_kind(kodi_id, kodi_type, kind, people_list)
 
-    @db.catch_operationalerrors
-    def _new_actor_id(self, name, art_url):
-        # Not yet in actor DB, add person
-        self.cursor.execute('INSERT INTO actor(name) VALUES (?)', (name, ))
-        actor_id = self.cursor.lastrowid
-        if art_url:
-            self.add_art(art_url, actor_id, 'actor', 'thumb')
-        return actor_id
-
-    def _get_actor_id(self, name, art_url=None):
-        """
-        Returns the tuple
-            (actor_id [int], new_entry [bool])
-        for name [unicode] in table actor (without ensuring that the name
-        matches)."new_entry" will be True if a new DB entry has just been
-        created.
-        If not, will create a new record with actor_id, name, art_url
+    def _lookup_actor_ids(self, names):
+        """
+        Returns a dict {name: actor_id} for all names [set of unicode] that
+        exist in table actor, using one query per chunk of names
+        """
+        actor_ids = {}
+        for chunk in common.chunks(names):
+            query = 'SELECT actor_id, name FROM actor WHERE name IN (%s)' \
+                % ','.join('?' * len(chunk))
+            actor_ids.update((name, actor_id) for actor_id, name
+                             in self.cursor.execute(query, chunk))
+        return actor_ids
+
+    def _actor_ids(self, people_list):
+        """
+        Returns a dict {name: (actor_id [int], new_entry [bool])} for all
+        people in people_list. "new_entry" will be True if a new DB entry
+        has just been created (including the art url of the person, if any).
+        Looks up all names we did not yet cache with one query and inserts
+        all new names in one go. Unlike genres, actor names are case-
+        sensitive
 
         Uses Plex ids and thus assumes that Plex person id is unique!
         """
-        self.cursor.execute('SELECT actor_id FROM actor WHERE name=? LIMIT 1',
-                            (name,))
-        try:
-            return (self.cursor.fetchone()[0], False)
-        except TypeError:
-            return (self._new_actor_id(name, art_url), True)
+        cache = self._name_ids['actor']
+        result = {}
+        missing = set()
+        for person in people_list:
+            if person[0] in cache:
+                result[person[0]] = (cache[person[0]], False)
+            else:
+                missing.add(person[0])
+        actor_ids = self._lookup_actor_ids(missing)
+        new_names = missing.difference(actor_ids)
+        if new_names:
+            self.cursor.executemany('INSERT OR IGNORE INTO actor(name) VALUES (?)',
+                                    [(x, ) for x in new_names])
+            actor_ids.update(self._lookup_actor_ids(new_names))
+        for name, actor_id in actor_ids.items():
+            cache[name] = actor_id
+            result[name] = (actor_id, name in new_names)
+        for person in people_list:
+            # Use the first art url we got for a new person
+            if person[0] in new_names and len(person) > 1 and person[1]:
+                new_names.discard(person[0])
+                actor_id = actor_ids[person[0]]
+                self.add_art(person[1], actor_id, 'actor', 'thumb')
+                self._actors_with_art[actor_id] = True
+        return result
 
     def _check_actor_art(self, actor_id, url):
         """
         Sets the actor's art url [unicode] for actor_id [int]
         """
+        if actor_id in self._actors_with_art:
+            return
         self.cursor.execute('''
             SELECT EXISTS(SELECT 1 FROM art
                           WHERE media_id = ? AND media_type = 'actor'
@@ -479,6 +541,7 @@ class KodiVideoDB(common.KodiDBBase):
         if not self.cursor.fetchone()[0]:
             # We got a new artwork url for this actor!
             self.add_art(url, actor_id, 'actor', 'thumb')
+        self._actors_with_art[actor_id] = True
 
     def get_art(self, kodi_id, kodi_type):
         """
@@ -699,14 +762,7 @@ class KodiVideoDB(common.KodiDBBase):
         """
         Will create a new tag if needed and return the tag_id
         """
-        self.cursor.execute('SELECT tag_id FROM tag WHERE name = ? COLLATE NOCASE',
-                            (name,))
-        try:
-            tag_id = self.cursor.fetchone()[0]
-        except TypeError:
-            self.cursor.execute('INSERT INTO tag(name) VALUES(?)', (name, ))
-            tag_id = self.cursor.lastrowid
-        return tag_id
+        return self._entry_ids('tag', 'tag_id', [name])[0]
 
     @db.catch_operationalerrors
     def update_tag(self, oldtag, newtag, kodiid, mediatype):
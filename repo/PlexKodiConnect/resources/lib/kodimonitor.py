@@ -79,7 +79,8 @@ class KodiMonitor(xbmc.Monitor):
             with app.APP.lock_playqueues:
                 self._playlist_onadd(data)
         elif method == 'Playlist.OnRemove':
-            self._playlist_onremove(data)
+            with app.APP.lock_playqueues:
+                self._playlist_onremove(data)
         elif method == 'Playlist.OnClear':
             with app.APP.lock_playqueues:
                 self._playlist_onclear(data)
@@ -99,9 +100,13 @@ class KodiMonitor(xbmc.Monitor):
             if utils.settings('dbSyncScreensaver') == "true":
                 self.waitForAbort(5)
                 app.SYNC.run_lib_scan = 'full'
+                app.APP.wake_up_sync_thread()
         elif method == "System.OnQuit":
             LOG.info('Kodi OnQuit detected - shutting down')
             app.APP.stop_pkc = True
+        if method.startswith(('Player.', 'Playlist.')):
+            # Let the PlaystateMgr check Kodi's players and playlists
+            app.APP.wake_up_playstate_thread()
 
     def _playlist_onadd(self, data):
         """
@@ -115,7 +120,11 @@ class KodiMonitor(xbmc.Monitor):
         }
         Will NOT be called if playback initiated by Kodi widgets
         """
-        pass
+        try:
+            playqueue = app.PLAYQUEUES[data['playlistid']]
+        except (KeyError, IndexError):
+            return
+        playqueue.kodi_item_added(data.get('position'))
 
     def _playlist_onremove(self, data):
         """
@@ -125,7 +134,11 @@ class KodiMonitor(xbmc.Monitor):
             u'position': 0
         }
         """
-        pass
+        try:
+            playqueue = app.PLAYQUEUES[data['playlistid']]
+        except (KeyError, IndexError):
+            return
+        playqueue.kodi_item_removed(data['position'])
 
     @staticmethod
     def _playlist_onclear(data):
@@ -136,6 +149,7 @@ class KodiMonitor(xbmc.Monitor):
         }
         """
         playqueue = app.PLAYQUEUES[data['playlistid']]
+        playqueue.kodi_items_cleared()
         if not playqueue.is_pkc_clear():
             playqueue.pkc_edit = True
             playqueue.clear(kodi=False)
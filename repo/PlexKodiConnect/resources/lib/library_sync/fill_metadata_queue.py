@@ -4,7 +4,7 @@ from queue import Full
 
 from . import common, sections
 from ..plex_db import PlexDB
-from .. import backgroundthread
+from .. import backgroundthread, app
 
 LOG = getLogger('PLEX.sync.fill_metadata_queue')
 
@@ -17,6 +17,10 @@ class FillMetadataQueue(common.LibrarySyncMixin,
     Determines which plex_ids we need to sync and puts these ids in a separate
     queue. Will use a COPIED plex.db file (plex-copy.db) in order to read much
     faster without the writing thread stalling
+
+    plex_ids are put into the queue in batches of app.SYNC.sync_batch_size
+    as tuples (count, [plex_id, ...], section), with count being the
+    position of the batch's first item within the section
     """
     def __init__(self, repair, section_queue, get_metadata_queue,
                  processing_queue):
@@ -32,33 +36,36 @@ class FillMetadataQueue(common.LibrarySyncMixin,
         LOG.debug('Process section %s with %s items',
                   section, section.number_of_items)
         count = 0
+        batch = []
         do_process_section = False
         with PlexDB(lock=False, copy=True) as plexdb:
-            for xml in section.iterator:
-                if self.should_cancel():
-                    break
-                plex_id = int(xml.get('ratingKey'))
-                checksum = int('{}{}'.format(
-                    plex_id,
-                    abs(int(xml.get('updatedAt',
-                            xml.get('addedAt', '1541572987'))))))
-                if (not self.repair and
-                        plexdb.checksum(plex_id, section.plex_type) == checksum):
-                    continue
-                if not do_process_section:
-                    do_process_section = True
-                    self.processing_queue.add_section(section)
-                    LOG.debug('Put section in processing queue: %s', section)
-                try:
-                    self.get_metadata_queue.put((count, plex_id, section),
-                                                timeout=QUEUE_TIMEOUT)
-                except Full:
-                    LOG.error('Putting %s in get_metadata_queue timed out - '
-                              'aborting sync now', plex_id)
-                    section.sync_successful = False
-                    break
-                else:
-                    count += 1
+            checksums = {} if self.repair else \
+                plexdb.checksums(section.plex_type, section.section_id)
+        for xml in section.iterator:
+            if self.should_cancel():
+                break
+            plex_id = int(xml.get('ratingKey'))
+            checksum = int('{}{}'.format(
+                plex_id,
+                abs(int(xml.get('updatedAt',
+                        xml.get('addedAt', '1541572987'))))))
+            if checksums.get(plex_id) == checksum:
+                continue
+            if not do_process_section:
+                do_process_section = True
+                self.processing_queue.add_section(section)
+                LOG.debug('Put section in processing queue: %s', section)
+            batch.append(plex_id)
+            if len(batch) < app.SYNC.sync_batch_size:
+                continue
+            if not self._put_batch(count, batch, section):
+                batch = []
+                break
+            count += len(batch)
+            batch = []
+        if (batch and not self.should_cancel() and
+                self._put_batch(count, batch, section)):
+            count += len(batch)
         # We might have received LESS items from the PMS than anticipated.
         # Ensures that our queues finish
         self.processing_queue.change_section_number_of_items(section,
@@ -66,6 +73,17 @@ class FillMetadataQueue(common.LibrarySyncMixin,
         LOG.debug('%s items to process for section %s',
                   section.number_of_items, section)
 
+    def _put_batch(self, count, batch, section):
+        try:
+            self.get_metadata_queue.put((count, batch, section),
+                                        timeout=QUEUE_TIMEOUT)
+        except Full:
+            LOG.error('Putting %s in get_metadata_queue timed out - '
+                      'aborting sync now', batch)
+            section.sync_successful = False
+            return False
+        return True
+
     def _run(self):
         while not self.should_cancel():
             section = self.section_queue.get()
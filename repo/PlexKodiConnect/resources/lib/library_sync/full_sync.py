@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from logging import getLogger
+from collections import defaultdict
 import queue
 
 import xbmcgui
@@ -11,6 +12,7 @@ from .process_metadata import ProcessMetadataThread
 from . import common, sections
 from .. import utils, timing, backgroundthread as bg, variables as v, app
 from .. import plex_functions as PF, itemtypes, path_ops
+from ..plex_db import PlexDB
 
 if common.PLAYLIST_SYNC_ENABLED:
     from .. import playlists
@@ -48,6 +50,10 @@ class FullSync(common.LibrarySyncMixin, bg.KillableThread):
         self.current_time = timing.plex_now()
         self.last_section = sections.Section()
         self.install_sync_done = utils.settings('SyncInstallRunDone') == 'true'
+        # {plex_type: set of plex_ids} of all items that we encountered on the
+        # PMS while synching the playstate of every item. None if we're not
+        # collecting plex_ids
+        self.plex_ids_on_pms = None
         super(FullSync, self).__init__()
 
     def update_progressbar(self, section, title, current):
@@ -126,9 +132,9 @@ class FullSync(common.LibrarySyncMixin, bg.KillableThread):
                         context.add_update(xml,
                                            section_name=section.name,
                                            section_id=section.section_id)
-                    context.plexdb.update_last_sync(int(xml.attrib['ratingKey']),
-                                                    section.plex_type,
-                                                    self.current_time)
+                    if self.plex_ids_on_pms is not None:
+                        self.plex_ids_on_pms[section.plex_type].add(
+                            int(xml.attrib['ratingKey']))
                     self.update_progressbar(section, '', section.count - 1)
                     if section.count % PLAYSTATE_BATCH_SIZE == 0:
                         context.commit()
@@ -251,14 +257,15 @@ class FullSync(common.LibrarySyncMixin, bg.KillableThread):
                 return
 
         # SYNC PLAYSTATE of ALL items (otherwise we won't pick up on items that
-        # were set to unwatched or changed user ratings). Also mark all items on
-        # the PMS to be able to delete the ones still in Kodi
+        # were set to unwatched or changed user ratings). Also remember all
+        # items on the PMS to be able to delete the ones still in Kodi
         LOG.debug('Start synching playstate and userdata for every item')
         # Make sure we're not showing an item's title in the sync dialog
         if not self.show_dialog_userdata and self.dialog:
             # Close the progress indicator dialog
             self.dialog.close()
             self.dialog = None
+        self.plex_ids_on_pms = defaultdict(set)
         bg.FunctionAsTask(self.threaded_get_generators,
                           None,
                           kinds,
@@ -267,7 +274,14 @@ class FullSync(common.LibrarySyncMixin, bg.KillableThread):
         self.processing_loop_playstates(section_queue)
         if self.should_cancel() or not self.successful:
             return
+        self.delete_items()
 
+    def delete_items(self):
+        """
+        Deletes all items in the Plex and Kodi DBs that we did not encounter
+        on the PMS while synching the playstate of every single item. Only
+        touches the rows of items that actually need to be deleted
+        """
         # Delete movies that are not on Plex anymore
         LOG.debug('Looking for items to delete')
         kinds = [
@@ -283,19 +297,18 @@ class FullSync(common.LibrarySyncMixin, bg.KillableThread):
                 (v.PLEX_TYPE_SONG, itemtypes.Song)
             ])
         for plex_type, context in kinds:
-            # Delete movies that are not on Plex anymore
-            while True:
+            plex_ids_on_pms = self.plex_ids_on_pms.pop(plex_type, set())
+            with PlexDB(lock=False) as plexdb:
+                plex_ids = [x for x in plexdb.plex_ids(plex_type)
+                            if x not in plex_ids_on_pms]
+            LOG.debug('Deleting %s items of type %s', len(plex_ids), plex_type)
+            for i in range(0, len(plex_ids), DELETION_BATCH_SIZE):
                 with context(self.current_time) as ctx:
-                    plex_ids = list(
-                        ctx.plexdb.plex_id_by_last_sync(plex_type,
-                                                        self.current_time,
-                                                        DELETION_BATCH_SIZE))
-                    for plex_id in plex_ids:
+                    for plex_id in plex_ids[i:i + DELETION_BATCH_SIZE]:
                         if self.should_cancel():
                             return
                         ctx.remove(plex_id, plex_type)
-                if len(plex_ids) < DELETION_BATCH_SIZE:
-                    break
+        self.plex_ids_on_pms = None
         LOG.debug('Done looking for items to delete')
 
     @utils.log_time
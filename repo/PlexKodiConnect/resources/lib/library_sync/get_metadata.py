@@ -12,8 +12,8 @@ LOCK = backgroundthread.threading.Lock()
 class GetMetadataThread(common.LibrarySyncMixin,
                         backgroundthread.KillableThread):
     """
-    Threaded download of Plex XML metadata for a certain library item.
-    Fills the queue with the downloaded etree XML objects
+    Threaded download of Plex XML metadata for a batch of library items.
+    Fills the queue with the downloaded etree XML objects, one per item
     """
     def __init__(self, get_metadata_queue, processing_queue):
         self.get_metadata_queue = get_metadata_queue
@@ -56,67 +56,102 @@ class GetMetadataThread(common.LibrarySyncMixin,
                     continue
             item['children'][plex_set_id] = collection_xmls[plex_set_id]
 
-    def _process_abort(self, count, section):
+    def _process_abort(self, count, section, number_of_items=1):
         # Make sure other threads will also receive sentinel
         self.get_metadata_queue.put(None)
         if count is not None:
-            self._process_skipped_item(count, section)
+            for i in range(number_of_items):
+                self._process_skipped_item(count + i, section)
 
     def _process_skipped_item(self, count, section):
         section.sync_successful = False
         # Add a "dummy" item so we're not skipping a beat
         self.processing_queue.put((count, {'section': section, 'xml': None}))
 
+    @staticmethod
+    def _download(plex_ids):
+        """
+        Downloads the metadata for all plex_ids. Returns a dict
+        {plex_id: xml}, None or 401
+        """
+        if len(plex_ids) == 1:
+            xml = PF.GetPlexMetadata(plex_ids[0])  # This will block
+            if xml is None or xml == 401:
+                return xml
+            return {plex_ids[0]: xml}
+        return PF.get_plex_metadata_batch(plex_ids)  # This will block
+
+    def _process_item(self, count, plex_id, xml, section):
+        """
+        Returns False if we need to abort, True otherwise
+        """
+        item = {
+            'xml': xml,
+            'children': None,
+            'section': section
+        }
+        if item['xml'] is None:
+            # Did not receive a valid XML - skip that item for now
+            LOG.error("Could not get metadata for %s. Skipping item "
+                      "for now", plex_id)
+            self._process_skipped_item(count, section)
+            return True
+        if section.plex_type == v.PLEX_TYPE_MOVIE:
+            # Check for collections/sets
+            collections = False
+            for child in item['xml'][0]:
+                if child.tag == 'Collection':
+                    collections = True
+                    break
+            if collections:
+                with LOCK:
+                    self._collections(item)
+        if section.get_children:
+            if self.should_cancel():
+                return False
+            children_xml = PF.GetAllPlexChildren(plex_id)  # Will block
+            try:
+                children_xml[0].attrib
+            except (TypeError, IndexError, AttributeError):
+                LOG.error('Could not get children for Plex id %s',
+                          plex_id)
+                self._process_skipped_item(count, section)
+                return True
+            else:
+                item['children'] = children_xml
+        self.processing_queue.put((count, item))
+        return True
+
     def _run(self):
         while True:
             item = self.get_metadata_queue.get()
             try:
                 if item is None or self.should_cancel():
                     self._process_abort(item[0] if item else None,
-                                        item[2] if item else None)
+                                        item[2] if item else None,
+                                        len(item[1]) if item else 1)
                     break
-                count, plex_id, section = item
-                item = {
-                    'xml': PF.GetPlexMetadata(plex_id),  # This will block
-                    'children': None,
-                    'section': section
-                }
-                if item['xml'] is None:
-                    # Did not receive a valid XML - skip that item for now
-                    LOG.error("Could not get metadata for %s. Skipping item "
-                              "for now", plex_id)
-                    self._process_skipped_item(count, section)
-                    continue
-                elif item['xml'] == 401:
+                count, plex_ids, section = item
+                xmls = self._download(plex_ids)
+                if xmls == 401:
                     LOG.error('HTTP 401 returned by PMS. Too much strain? '
                               'Cancelling sync for now')
                     utils.window('plex_scancrashed', value='401')
-                    self._process_abort(count, section)
+                    self._process_abort(count, section, len(plex_ids))
                     break
-                if section.plex_type == v.PLEX_TYPE_MOVIE:
-                    # Check for collections/sets
-                    collections = False
-                    for child in item['xml'][0]:
-                        if child.tag == 'Collection':
-                            collections = True
-                            break
-                    if collections:
-                        with LOCK:
-                            self._collections(item)
-                if section.get_children:
-                    if self.should_cancel():
-                        self._process_abort(count, section)
+                xmls = xmls or {}
+                abort = False
+                for i, plex_id in enumerate(plex_ids):
+                    if not self._process_item(count + i,
+                                              plex_id,
+                                              xmls.get(plex_id),
+                                              section):
+                        self._process_abort(count + i,
+                                            section,
+                                            len(plex_ids) - i)
+                        abort = True
                         break
-                    children_xml = PF.GetAllPlexChildren(plex_id)  # Will block
-                    try:
-                        children_xml[0].attrib
-                    except (TypeError, IndexError, AttributeError):
-                        LOG.error('Could not get children for Plex id %s',
-                                  plex_id)
-                        self._process_skipped_item(count, section)
-                        continue
-                    else:
-                        item['children'] = children_xml
-                self.processing_queue.put((count, item))
+                if abort:
+                    break
             finally:
                 self.get_metadata_queue.task_done()
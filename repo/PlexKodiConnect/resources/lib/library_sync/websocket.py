@@ -9,6 +9,7 @@ from ..plex_db import PlexDB
 from .. import kodi_db
 from .. import backgroundthread, plex_functions as PF, itemtypes
 from .. import artwork, utils, timing, variables as v, app
+from .. import response_cache
 
 if PLAYLIST_SYNC_ENABLED:
     from .. import playlists
@@ -38,10 +39,17 @@ def store_websocket_message(message):
     do with "process_" methods
     """
     if message['type'] == 'playing':
+        if any(x.get('state') == 'stopped'
+               for x in message['PlaySessionStateNotification']):
+            # Playstates and "On Deck" have changed
+            response_cache.expire()
         process_playing(message['PlaySessionStateNotification'])
     elif message['type'] == 'timeline':
+        response_cache.expire()
         store_timeline_message(message['TimelineEntry'])
     elif message['type'] == 'activity':
+        if any(x['event'] == 'ended' for x in message['ActivityNotification']):
+            response_cache.expire()
         store_activity_message(message['ActivityNotification'])
 
 
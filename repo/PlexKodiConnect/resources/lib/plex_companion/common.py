@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 import logging
 from copy import deepcopy
+import threading
+import time
 import requests
 import xml.etree.ElementTree as etree
 
@@ -17,6 +19,16 @@ requests.packages.urllib3.disable_warnings()
 log = logging.getLogger('PLEX.companion')
 
 TIMEOUT = (5, 5)
+# Seconds a subscriber's sending thread waits for the next timeline before
+# exiting
+SUBSCRIBER_IDLE_TIMEOUT = 30
+# We won't send the same timeline to a subscriber again - unless we haven't
+# sent anything for this many seconds
+SUBSCRIBER_KEEPALIVE = 30
+
+# {'scheme://host:port': requests.Session()} - one session per subscriber host
+SESSIONS = {}
+SESSIONS_LOCK = threading.Lock()
 
 # What is Companion controllable?
 CONTROLLABLE = {
@@ -92,6 +104,38 @@ def create_requests_session():
     return s
 
 
+def get_session(url):
+    """
+    Returns the requests Session for the host of url. Subscribers talking to
+    the same host, e.g. the PMS, will thus reuse the same connections
+    """
+    parsed = utils.urlparse(url)
+    host = f'{parsed.scheme}://{parsed.netloc}'
+    with SESSIONS_LOCK:
+        if host not in SESSIONS:
+            SESSIONS[host] = create_requests_session()
+        return SESSIONS[host]
+
+
+def close_sessions():
+    with SESSIONS_LOCK:
+        sessions = list(SESSIONS.values())
+        SESSIONS.clear()
+    for s in sessions:
+        s.close()
+
+
+def timeline_key(message, state, command_id):
+    """
+    Returns a hashable representation of a timeline xml in order to detect
+    unchanged timelines
+    """
+    return (state,
+            command_id,
+            message.get('location'),
+            tuple(tuple(sorted(entry.attrib.items())) for entry in message))
+
+
 def communicate(method, url, **kwargs):
     req = method(url, **kwargs)
     req.encoding = 'utf-8'
@@ -236,6 +280,12 @@ def b_ok_message():
 
 
 class Subscriber(object):
+    """
+    A Plex Companion client that subscribed to our timeline. Timelines are
+    sent by a dedicated thread per subscriber in order to never block the
+    caller, e.g. if the subscriber's device is not responding. Only the
+    latest timeline is kept, older ones that could not be sent yet are dropped
+    """
     def __init__(self, playstate_mgr, cmd=None, uuid=None, command_id=None,
                  url=None):
         self.playstate_mgr = playstate_mgr
@@ -247,8 +297,16 @@ class Subscriber(object):
             self.uuid = str(uuid)
             self.command_id = command_id
             self.url = f'{url}/:/timeline'
-        self.s = create_requests_session()
+        self.s = get_session(self.url)
         self._errors_left = 3
+        self._condition = threading.Condition()
+        # (message, state) of the next timeline to send
+        self._pending = None
+        self._thread = None
+        self._closed = False
+        self._last_key = None
+        self._last_time = 0.0
+        self.dropped = 0
 
     def __eq__(self, other):
         if isinstance(other, str):
@@ -261,30 +319,80 @@ class Subscriber(object):
     def __hash__(self):
         return hash(self.uuid)
 
-    def __del__(self):
-        """Make sure we are closing the Session() correctly."""
-        self.s.close()
-
     def _on_error(self):
         self._errors_left -= 1
         if self._errors_left == 0:
             log.warn('Too many issues contacting subscriber %s. Unsubscribing',
                      self.uuid)
-            self.playstate_mgr.unsubscribe(self)
+            self.playstate_mgr.unsubscribe(self.uuid)
 
     def send_timeline(self, message, state):
-        message = deepcopy(message)
-        message.set('commandID', str(self.command_id + 1))
-        self.s.params['state'] = state
-        self.s.params['commandID'] = self.command_id + 1
+        """
+        Queues the timeline xml message for sending and returns immediately.
+        Unchanged timelines are skipped
+        """
+        command_id = self.command_id + 1
+        key = timeline_key(message, state, command_id)
+        now = time.monotonic()
+        with self._condition:
+            if self._closed:
+                return
+            if (key == self._last_key and
+                    now - self._last_time < SUBSCRIBER_KEEPALIVE):
+                return
+            self._last_key = key
+            self._last_time = now
+            if self._pending is not None:
+                self.dropped += 1
+                log.debug('Dropping stale timeline for subscriber %s, '
+                          'dropped in total: %s', self.uuid, self.dropped)
+            message = deepcopy(message)
+            message.set('commandID', str(command_id))
+            self._pending = (message, state)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._send_loop,
+                    name=f'PlexCompanionSubscriber-{self.uuid}',
+                    daemon=True)
+                self._thread.start()
+            else:
+                self._condition.notify()
+
+    def close(self, timeout=None):
+        """
+        Stops the sending thread after it sent the pending timeline. Waits
+        at most timeout seconds for that
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None and timeout:
+            thread.join(timeout)
+
+    def _send_loop(self):
+        while True:
+            with self._condition:
+                if self._pending is None and not self._closed:
+                    self._condition.wait(SUBSCRIBER_IDLE_TIMEOUT)
+                if self._pending is None:
+                    self._thread = None
+                    return
+                message, state = self._pending
+                self._pending = None
+            self._send(message, state)
+
+    def _send(self, message, state):
+        params = {'state': state, 'commandID': message.get('commandID')}
         # Send update
         log.debug('Sending timeline update to %s with params %s',
-                  self.uuid, self.s.params)
+                  self.uuid, params)
         utils.log_xml(message, log.debug, logging.DEBUG)
         try:
             req = communicate(self.s.post,
                               self.url,
                               data=etree.tostring(message, encoding='utf8'),
+                              params=params,
                               timeout=TIMEOUT)
         except requests.RequestException as error:
             log.warn('Error sending timeline to Subscriber %s: %s: %s',
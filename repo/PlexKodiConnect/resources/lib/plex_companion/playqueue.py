@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 from logging import getLogger
 import copy
+import time
 
 from ..plex_api import API
 from .. import variables as v
@@ -10,10 +11,14 @@ from .. import utils
 from .. import plex_functions as PF
 from .. import playlist_func as PL
 from .. import exceptions
+from .. import json_rpc as js
 
 log = getLogger('PLEX.companion.playqueue')
 
 PLUGIN = 'plugin://%s' % v.ADDON_ID
+# Seconds after which we fetch the entire Kodi playlist again, just in case
+# we missed a change, e.g. swapped items
+FULL_RESYNC_INTERVAL = 30
 
 
 def init_playqueue_from_plex_children(plex_id, transient_token=None):
@@ -43,20 +48,110 @@ def init_playqueue_from_plex_children(plex_id, transient_token=None):
     return playqueue
 
 
+def kodi_playlist_items(playqueue):
+    """
+    Returns the items of the Kodi playlist for playqueue, see
+    js.playlist_get_items(). Only fetches the items from Kodi that were added
+    since the last call (see playqueue.kodi_items). Falls back to fetching
+    the entire Kodi playlist if our copy is out of sync
+    """
+    items = playqueue.kodi_items
+    if (items is None or
+            time.monotonic() - playqueue.kodi_items_synced > FULL_RESYNC_INTERVAL or
+            len(items) != js.playlist_size(playqueue.playlistid)):
+        items = js.playlist_get_items(playqueue.playlistid)
+        playqueue.kodi_items = list(items)
+        playqueue.kodi_items_synced = time.monotonic()
+        return items
+    # One JSON RPC call per block of consecutive new items
+    start = None
+    for position in range(len(items) + 1):
+        if position < len(items) and items[position] is None:
+            if start is None:
+                start = position
+        elif start is not None:
+            new_items = js.playlist_get_items(playqueue.playlistid,
+                                              start,
+                                              position)
+            if len(new_items) != position - start:
+                log.debug('Kodi playlist %s changed in the meantime',
+                          playqueue.playlistid)
+                playqueue.kodi_items = None
+                return kodi_playlist_items(playqueue)
+            items[start:position] = new_items
+            start = None
+    return list(items)
+
+
+def _is_other_addon(path):
+    """
+    Returns True if path belongs to another addon than PKC
+    """
+    try:
+        return path.startswith('plugin://') and not path.startswith(PLUGIN)
+    except AttributeError:
+        # were not passed a filename
+        return False
+
+
+def _identical(old_item, new_item):
+    """
+    Returns True if the PKC playlist item old_item and the Kodi playlist item
+    new_item are identical
+    """
+    if 'id' in new_item:
+        return (old_item.kodi_id == new_item['id'] and
+                old_item.kodi_type == new_item['type'])
+    try:
+        plex_id = int(utils.REGEX_PLEX_ID.findall(new_item['file'])[0])
+    except IndexError:
+        log.debug('Comparing paths directly as a fallback')
+        return old_item.file == new_item['file']
+    else:
+        return plex_id == old_item.plex_id
+
+
 def compare_playqueues(playqueue, new_kodi_playqueue):
     """
     Used to poll the Kodi playqueue and update the Plex playqueue if needed
     """
     old = list(playqueue.items)
-    # We might append to new_kodi_playqueue but will need the original
-    # still back in the main loop
-    new = copy.deepcopy(new_kodi_playqueue)
+    # PL functions might alter the Kodi items we pass in, but we will need
+    # the originals still back in the main loop. Hence we only copy these
+    # items (the items are flat dicts) instead of the entire list
+    new = list(new_kodi_playqueue)
+    # Current position of the old items in our play queue
     index = list(range(0, len(old)))
-    log.debug('Comparing new Kodi playqueue %s with our play queue %s',
-              new, old)
+    log.debug('Comparing new Kodi playqueue of %s items with our play queue '
+              'of %s items', len(new), len(old))
+    # Skip the items at the beginning of both lists that did not change
+    unchanged = 0
+    first = 0
     for i, new_item in enumerate(new):
-        if (new_item['file'].startswith('plugin://') and
-                not new_item['file'].startswith(PLUGIN)):
+        if _is_other_addon(new_item['file']):
+            continue
+        if (unchanged < len(old) and
+                not _is_other_addon(old[unchanged].file) and
+                _identical(old[unchanged], new_item)):
+            unchanged += 1
+            first = i + 1
+        else:
+            break
+    del old[:unchanged], index[:unchanged]
+    # ... and at the end of both lists
+    last = len(new)
+    while old and last > first:
+        new_item = new[last - 1]
+        if _is_other_addon(new_item['file']):
+            last -= 1
+        elif (not _is_other_addon(old[-1].file) and
+                _identical(old[-1], new_item)):
+            del old[-1], index[-1]
+            last -= 1
+        else:
+            break
+    for i, new_item in enumerate(new[first:last], start=first):
+        if _is_other_addon(new_item['file']):
             # Ignore new media added by other addons
             continue
         for j, old_item in enumerate(old):
@@ -65,24 +160,10 @@ def compare_playqueues(playqueue, new_kodi_playqueue):
                 # Chances are that we got an empty Kodi playlist due to
                 # Kodi exit
                 return
-            try:
-                if (old_item.file.startswith('plugin://') and not old_item.file.startswith(PLUGIN)):
-                    # Ignore media by other addons
-                    continue
-            except AttributeError:
-                # were not passed a filename; ignore
-                pass
-            if 'id' in new_item:
-                identical = (old_item.kodi_id == new_item['id'] and
-                             old_item.kodi_type == new_item['type'])
-            else:
-                try:
-                    plex_id = int(utils.REGEX_PLEX_ID.findall(new_item['file'])[0])
-                except IndexError:
-                    log.debug('Comparing paths directly as a fallback')
-                    identical = old_item.file == new_item['file']
-                else:
-                    identical = plex_id == old_item.plex_id
+            if _is_other_addon(old_item.file):
+                # Ignore media by other addons
+                continue
+            identical = _identical(old_item, new_item)
             if j == 0 and identical:
                 del old[0], index[0]
                 break
@@ -95,18 +176,23 @@ def compare_playqueues(playqueue, new_kodi_playqueue):
                     log.error('Could not modify playqueue positions')
                     log.error('This is likely caused by mixing audio and '
                               'video tracks in the Kodi playqueue')
-                del old[j], index[i]
+                else:
+                    # The items we skipped moved one position back
+                    for k in range(j):
+                        index[k] += 1
+                del old[j], index[j]
                 break
         else:
             log.debug('Detected new Kodi element at position %s: %s ',
                       i, new_item)
             try:
                 if playqueue.id is None:
-                    PL.init_plex_playqueue(playqueue, kodi_item=new_item)
+                    PL.init_plex_playqueue(playqueue,
+                                           kodi_item=copy.copy(new_item))
                 else:
                     PL.add_item_to_plex_playqueue(playqueue,
                                                   i,
-                                                  kodi_item=new_item)
+                                                  kodi_item=copy.copy(new_item))
             except exceptions.PlaylistError:
                 # Could not add the element
                 pass
@@ -126,7 +212,8 @@ def compare_playqueues(playqueue, new_kodi_playqueue):
                 # Also see kodimonitor.py - _playlist_onadd()
                 pass
             else:
-                for j in range(i, len(index)):
+                # All remaining old items are behind the new item
+                for j in range(len(index)):
                     index[j] += 1
     for i in reversed(index):
         if app.APP.stop_pkc:
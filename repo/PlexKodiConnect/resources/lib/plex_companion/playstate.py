@@ -1,12 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from logging import getLogger
+import time
 import requests
 from threading import Thread
 
 from .common import communicate, log_error, UUIDStr, Subscriber, timeline, \
-    stopped_timeline, create_requests_session, proxy_params
-from .playqueue import compare_playqueues
+    stopped_timeline, create_requests_session, proxy_params, close_sessions
+from .playqueue import compare_playqueues, kodi_playlist_items
 from .webserver import ThreadedHTTPServer, CompanionHandlerClassFactory
 from .plexgdm import plexgdm
 
@@ -24,10 +25,22 @@ requests.packages.urllib3.disable_warnings()
 log = getLogger('PLEX.companion.playstate')
 
 TIMEOUT = (5, 5)
+# Max. seconds we wait for each subscriber to send its last timeline when
+# closing connections
+SUBSCRIBER_CLOSE_TIMEOUT = 2
 
 # How many seconds do we wait until we check again whether we are registered
 # as a GDM Plex Companion Client?
 GDM_COMPANION_CHECK = 120
+# Max. seconds between two timeline updates for the PMS and Companion
+# subscribers if nothing but the playback progress changed
+PMS_TIMELINE_INTERVAL = 10
+COMPANION_TIMELINE_INTERVAL = 5
+# Deviation [ms] of the playback progress we still consider as normal playback
+# and not as a seek
+SEEK_TOLERANCE = 2000
+# Seconds between logging the number of JSON RPC calls to Kodi
+JSON_RPC_STATS_INTERVAL = 3600
 
 
 def update_player_info(players):
@@ -41,12 +54,36 @@ def update_player_info(players):
         app.PLAYSTATE.player_states[playerid]['muted'] = js.get_muted()
 
 
+def timeline_changed(old, new, elapsed):
+    """
+    Returns True if anything but the playback progress changed between the
+    timeline xmls old and new - or if the progress did not advance by elapsed
+    seconds as expected, e.g. because the user seeked
+    """
+    for old_entry, new_entry in zip(old, new):
+        old_attrib = dict(old_entry.attrib)
+        new_attrib = dict(new_entry.attrib)
+        old_time = int(old_attrib.pop('time', 0))
+        new_time = int(new_attrib.pop('time', 0))
+        if old_attrib != new_attrib:
+            return True
+        if new_attrib.get('state') == 'playing':
+            old_time += elapsed * 1000
+        if abs(new_time - old_time) > SEEK_TOLERANCE:
+            return True
+    return False
+
+
 class PlaystateMgr(backgroundthread.KillableThread):
     """
     If Kodi plays something, tell the PMS about it and - if a Companion client
     is connected - tell the PMS Plex Companion piece of the PMS about it.
     Also checks whether an intro is currently playing, enabling the user to
     skip it.
+
+    Kodi's players and playlists are only polled while Kodi is playing a Plex
+    item. Otherwise, we wait for kodimonitor to wake us up on Kodi's Player
+    and Playlist notifications.
     """
     daemon = True
 
@@ -57,6 +94,11 @@ class PlaystateMgr(backgroundthread.KillableThread):
         self.httpd = None
         self.stopped_timeline = stopped_timeline()
         self.gdm = plexgdm()
+        # Did we already tell the PMS that playback stopped?
+        self.signaled_playback_stop = True
+        # {'pms' or 'companion': (monotonic time, timeline xml)} of the last
+        # timeline we sent
+        self.last_timeline = {}
         msg = stopped_timeline()
         self.last_pms_msg = {
             0: msg[0].attrib,
@@ -104,12 +146,18 @@ class PlaystateMgr(backgroundthread.KillableThread):
         """May also be called from another thread"""
         self._stop_webserver()
         self._close_requests_session()
-        self.subscribers = dict()
+        with app.APP.lock_subscriber:
+            subscribers = list(self.subscribers.values())
+            self.subscribers = dict()
+        for subscriber in subscribers:
+            subscriber.close(SUBSCRIBER_CLOSE_TIMEOUT)
+        close_sessions()
 
     def send_stop(self):
         """
         If we're still connected to a PMS, tells the PMS that playback stopped
         """
+        self.last_timeline = {}
         self.pms_timeline(None, self.stopped_timeline)
         self.companion_timeline(self.stopped_timeline)
 
@@ -121,10 +169,12 @@ class PlaystateMgr(backgroundthread.KillableThread):
             if cmd.get('path') == '/player/timeline/unsubscribe':
                 if uuid in self.subscribers:
                     log.debug('Stop Plex Companion subscription for %s', uuid)
-                    del self.subscribers[uuid]
+                    self.subscribers.pop(uuid).close()
             elif uuid not in self.subscribers:
                 log.debug('Start new Plex Companion subscription for %s', uuid)
                 self.subscribers[uuid] = Subscriber(self, cmd=cmd)
+                # Send the current timeline to the new subscriber right away
+                self.last_timeline.pop('companion', None)
             else:
                 try:
                     self.subscribers[uuid].command_id = int(cmd.get('commandID'))
@@ -134,17 +184,21 @@ class PlaystateMgr(backgroundthread.KillableThread):
     def subscribe(self, uuid, command_id, url):
         log.debug('New Plex Companion subscriber %s: %s', uuid, url)
         with app.APP.lock_subscriber:
+            old = self.subscribers.get(UUIDStr(uuid))
+            if old is not None:
+                old.close()
             self.subscribers[UUIDStr(uuid)] = Subscriber(self,
                                                          cmd=None,
                                                          uuid=uuid,
                                                          command_id=command_id,
                                                          url=url)
+            self.last_timeline.pop('companion', None)
 
     def unsubscribe(self, uuid):
         log.debug('Unsubscribing Plex Companion client %s', uuid)
         with app.APP.lock_subscriber:
             try:
-                del self.subscribers[UUIDStr(uuid)]
+                self.subscribers.pop(UUIDStr(uuid)).close()
             except KeyError:
                 pass
 
@@ -156,11 +210,17 @@ class PlaystateMgr(backgroundthread.KillableThread):
         return True
 
     def companion_timeline(self, message):
+        """
+        Hands the timeline to every subscriber - won't block as the
+        subscribers send the timeline in their own threads
+        """
         state = 'stopped'
         for entry in message:
             if entry.get('state') != 'stopped':
                 state = entry.get('state')
-        for subscriber in self.subscribers.values():
+        with app.APP.lock_subscriber:
+            subscribers = list(self.subscribers.values())
+        for subscriber in subscribers:
             subscriber.send_timeline(message, state)
 
     def pms_timeline_per_player(self, playerid, message):
@@ -169,6 +229,10 @@ class PlaystateMgr(backgroundthread.KillableThread):
         differently
         """
         url = f'{app.CONN.server}/:/timeline'
+        if (message[playerid].attrib.get('state') == 'stopped' and
+                self.last_pms_msg[playerid].get('state') == 'stopped'):
+            # We already told the PMS that this player stopped
+            return
         self._get_requests_session()
         if message[playerid].attrib.get('state') != 'stopped':
             params = proxy_params()
@@ -197,6 +261,88 @@ class PlaystateMgr(backgroundthread.KillableThread):
         for player in players.values():
             self.pms_timeline_per_player(player['playerid'], message)
 
+    def needs_timeline(self, target, message, interval):
+        """
+        Coalesces the timeline updates for target ('pms' or 'companion'):
+        returns True only if something but the playback progress changed or
+        if we haven't sent a timeline for interval seconds
+        """
+        now = time.monotonic()
+        try:
+            last_time, last_message = self.last_timeline[target]
+        except KeyError:
+            pass
+        else:
+            elapsed = now - last_time
+            if (elapsed < interval and
+                    not timeline_changed(last_message, message, elapsed)):
+                return False
+        self.last_timeline[target] = (now, message)
+        return True
+
+    def send_timeline(self, players, message):
+        if self.needs_timeline('pms', message, PMS_TIMELINE_INTERVAL):
+            # Send the playback progress info to the PMS
+            self.pms_timeline(players, message)
+        if (self.subscribers and
+                self.needs_timeline('companion', message,
+                                    COMPANION_TIMELINE_INTERVAL)):
+            # Send the info to all Companion devices via the PMS
+            self.companion_timeline(message)
+
+    def check_playqueues(self):
+        """
+        Checks for Kodi playlist changes
+        """
+        with app.APP.lock_playqueues:
+            for playqueue in app.PLAYQUEUES:
+                kodi_pl = kodi_playlist_items(playqueue)
+                if playqueue.old_kodi_pl != kodi_pl:
+                    if playqueue.id is None and (not app.SYNC.direct_paths or
+                                                 app.PLAYSTATE.context_menu_play):
+                        # Only initialize if directly fired up using direct
+                        # paths. Otherwise let default.py do its magic
+                        log.debug('Not yet initiating playback')
+                    else:
+                        # compare old and new playqueue
+                        compare_playqueues(playqueue, kodi_pl)
+                    playqueue.old_kodi_pl = list(kodi_pl)
+
+    def check_playback(self):
+        """
+        Checks for Kodi playback and tells the PMS and Companion subscribers
+        about it. Returns True if we need to keep polling Kodi's players
+        """
+        players = js.get_players()
+        if not players:
+            if not self.signaled_playback_stop:
+                # Playback has just stopped, need to tell Plex
+                self.send_stop()
+                self.signaled_playback_stop = True
+            return False
+        elif not app.PLAYSTATE.item:
+            # Not a Plex item currently playing. We'll be woken up once Kodi
+            # starts playing something else
+            return False
+        # Update the playstate info, such as playback progress
+        update_player_info(players)
+        try:
+            message = timeline(players)
+        except (TypeError, IndexError):
+            # We haven't had a chance to set the kodi_stream_index for
+            # the currently playing item. Just skip for now
+            return True
+        # Kodi will started with 'stopped' - make sure we're
+        # waiting here until we got something playing or on pause.
+        for entry in message:
+            if entry.get('state') != 'stopped':
+                break
+        else:
+            return True
+        self.signaled_playback_stop = False
+        self.send_timeline(players, message)
+        return True
+
     def wait_while_suspended(self):
         should_shutdown = super().wait_while_suspended()
         if not should_shutdown:
@@ -204,7 +350,7 @@ class PlaystateMgr(backgroundthread.KillableThread):
         return should_shutdown
 
     def run(self):
-        app.APP.register_thread(self)
+        app.APP.register_playstate_thread(self)
         log.info("----===## Starting PlaystateMgr ##===----")
         try:
             self._run()
@@ -213,74 +359,38 @@ class PlaystateMgr(backgroundthread.KillableThread):
             self.send_stop()
             # Cleanup
             self.close_connections()
-            app.APP.deregister_thread(self)
+            app.APP.deregister_playstate_thread(self)
             log.info("----===## PlaystateMgr stopped ##===----")
 
     def _run(self):
-        signaled_playback_stop = True
         self._start_webserver()
         self.gdm.start()
         last_check = timing.unix_timestamp()
+        last_stats = last_check
+        last_calls = js.JsonRPC.calls
+        # Kodi might already be playing something, e.g. if PKC restarted
+        woken_up = playing = True
         while not self.should_cancel():
             if self.should_suspend():
                 self.close_connections()
                 if self.wait_while_suspended():
                     break
-            # Check for Kodi playlist changes first
-            with app.APP.lock_playqueues:
-                for playqueue in app.PLAYQUEUES:
-                    kodi_pl = js.playlist_get_items(playqueue.playlistid)
-                    if playqueue.old_kodi_pl != kodi_pl:
-                        if playqueue.id is None and (not app.SYNC.direct_paths or
-                                                     app.PLAYSTATE.context_menu_play):
-                            # Only initialize if directly fired up using direct
-                            # paths. Otherwise let default.py do its magic
-                            log.debug('Not yet initiating playback')
-                        else:
-                            # compare old and new playqueue
-                            compare_playqueues(playqueue, kodi_pl)
-                        playqueue.old_kodi_pl = list(kodi_pl)
+                woken_up = True
+            if woken_up or playing:
+                # Check for Kodi playlist changes first
+                self.check_playqueues()
             # Make sure we are registered as a player
             now = timing.unix_timestamp()
-            if now - last_check > GDM_COMPANION_CHECK:
+            if now - last_check >= GDM_COMPANION_CHECK:
                 self.gdm.check_client_registration()
                 last_check = now
+            if now - last_stats >= JSON_RPC_STATS_INTERVAL:
+                log.debug('JSON RPC calls to Kodi during the last %ss: %s',
+                          now - last_stats, js.JsonRPC.calls - last_calls)
+                last_stats = now
+                last_calls = js.JsonRPC.calls
             # Then check for Kodi playback
-            players = js.get_players()
-            if not players and signaled_playback_stop:
-                self.sleep(1)
-                continue
-            elif not players:
-                # Playback has just stopped, need to tell Plex
-                self.send_stop()
-                signaled_playback_stop = True
-                self.sleep(1)
-                continue
-            elif not app.PLAYSTATE.item:
-                # Not a Plex item currently playing
-                self.sleep(1)
-                continue
-            else:
-                # Update the playstate info, such as playback progress
-                update_player_info(players)
-                try:
-                    message = timeline(players)
-                except (TypeError, IndexError):
-                    # We haven't had a chance to set the kodi_stream_index for
-                    # the currently playing item. Just skip for now
-                    self.sleep(1)
-                    continue
-                else:
-                    # Kodi will started with 'stopped' - make sure we're
-                    # waiting here until we got something playing or on pause.
-                    for entry in message:
-                        if entry.get('state') != 'stopped':
-                            break
-                    else:
-                        continue
-                    signaled_playback_stop = False
-            # Send the playback progress info to the PMS
-            self.pms_timeline(players, message)
-            # Send the info to all Companion devices via the PMS
-            self.companion_timeline(message)
-            self.sleep(1)
+            if woken_up or playing:
+                playing = self.check_playback()
+            woken_up = self.wait_for_wake_up(1 if playing
+                                             else GDM_COMPANION_CHECK)
@@ -123,6 +123,16 @@ class PlexDBBase(object):
         except TypeError:
             pass
 
+    def checksums(self, plex_type, section_id):
+        """
+        Returns a dict {plex_id: checksum} for all items of plex_type in the
+        library section section_id. Use this instead of checksum() if you need
+        to check lots of items - one single SELECT instead of one per item
+        """
+        self.cursor.execute('SELECT plex_id, checksum FROM %s WHERE section_id = ?' % plex_type,
+                            (section_id, ))
+        return dict(self.cursor.fetchall())
+
     def update_last_sync(self, plex_id, plex_type, last_sync):
         """
         Sets a new timestamp for plex_id
@@ -136,6 +146,14 @@ class PlexDBBase(object):
         """
         self.cursor.execute('DELETE FROM %s WHERE plex_id = ?' % plex_type, (plex_id, ))
 
+    def plex_ids(self, plex_type):
+        """
+        Returns an iterator for all plex_ids of plex_type, sorted by plex_id
+        """
+        return (x[0] for x in
+                self.cursor.execute('SELECT plex_id FROM %s ORDER BY plex_id'
+                                    % plex_type))
+
     def every_plex_id(self, plex_type, offset, limit):
         """
         Returns an iterator for plex_type for every single plex_id
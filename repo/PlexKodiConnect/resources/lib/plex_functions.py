@@ -2,17 +2,23 @@
 # -*- coding: utf-8 -*-
 from logging import getLogger
 from ast import literal_eval
+from collections import deque
 from copy import deepcopy
+from functools import partial
 from time import time
-from threading import Thread
+from threading import Thread, Condition
 
 from .downloadutils import DownloadUtils as DU, exceptions
 from . import backgroundthread, utils, plex_tv, variables as v, app
+from . import response_cache
 
 ###############################################################################
 LOG = getLogger('PLEX.plex_functions')
 
 CONTAINERSIZE = int(utils.settings('limitindex'))
+# How often shall we check whether Kodi is shutting down while we're waiting
+# for a chunk of PMS items to download? (seconds)
+ABORT_CHECK_INTERVAL = 1.0
 
 # For discovery of PMS in the local LAN
 PLEX_GDM_IP = b'239.0.0.250'  # multicast to PMS
@@ -470,6 +476,33 @@ def GetPlexMetadata(key, reraise=False):
         url = "{server}" + key
     else:
         url = "{server}/library/metadata/" + key
+    return _download_metadata(url, reraise)
+
+
+def get_plex_metadata_batch(plex_ids, reraise=False):
+    """
+    Returns raw API metadata for several plex_ids at once by asking the PMS
+    for /library/metadata/<id1>,<id2>,... Pass in a list of ints.
+
+    Returns a dict {plex_id: xml}, where every xml is a copy of the PMS'
+    container with exactly one child - just like GetPlexMetadata() would
+    return it. plex_ids that the PMS did not return are missing from the dict.
+
+    Returns None or 401 if something went wrong
+    """
+    url = '{server}/library/metadata/%s' % ','.join(str(x) for x in plex_ids)
+    xml = _download_metadata(url, reraise)
+    if xml is None or xml == 401:
+        return xml
+    result = {}
+    for child in xml:
+        container = xml.makeelement(xml.tag, xml.attrib)
+        container.append(child)
+        result[utils.cast(int, child.get('ratingKey'))] = container
+    return result
+
+
+def _download_metadata(url, reraise):
     arguments = {
         'checkFiles': 0,
         'includeExtras': 1,         # Trailers and Extras => Extras
@@ -592,6 +625,11 @@ class DownloadGen(object):
     Special iterator object that will yield all child xmls piece-wise. It also
     saves the original xml.attrib.
 
+    Downloaded chunks are buffered by their container start position and are
+    consumed strictly in that order, no matter in which order the downloads
+    complete. Every chunk is released as soon as its last child has been
+    yielded.
+
     Yields XML etree children or raises RuntimeError at the end
     """
     def __init__(self, url, plex_type, last_viewed_at, updated_at, args,
@@ -617,23 +655,48 @@ class DownloadGen(object):
         self.current = 0
         self.total = int(self.attrib['totalSize'])
         self.cache_factor = 10
+        # Notified every time a chunk download has completed
+        self._chunk_arrived = Condition()
+        # Downloaded chunks that we did not yet start to consume.
+        # {container start: list of xml children or None if download failed}
+        self._chunks = {}
+        # Children of the chunk we're currently consuming
+        self._current_chunk = deque(self.xml)
+        # Container start of the next chunk to consume
+        self._next_start = CONTAINERSIZE
+        # Release the children, we only need the container's attributes
+        del self.xml[:]
+        # Number of children currently held in memory and its high-water mark
+        self.buffered = len(self._current_chunk)
+        self.max_buffered = self.buffered
         # Will keep track whether we still have results incoming
         self.pending_counter = []
         end = min(self.cache_factor * CONTAINERSIZE,
                   self.total + CONTAINERSIZE - self.total % CONTAINERSIZE)
         for pos in range(CONTAINERSIZE, end, CONTAINERSIZE):
-            self.pending_counter.append(None)
-            self._downloader(self.url, self.args, pos, self.on_chunk_downloaded)
+            self._download(pos)
 
     def set_xml(self, xml):
         self.xml = xml
 
-    def on_chunk_downloaded(self, xml):
-        if xml is not None:
-            self.xml.extend(xml)
-        else:
-            self.successful = False
-        self.pending_counter.pop()
+    def _download(self, start):
+        self.pending_counter.append(None)
+        self._downloader(self.url,
+                         self.args,
+                         start,
+                         partial(self.on_chunk_downloaded, start))
+
+    def on_chunk_downloaded(self, start, xml):
+        with self._chunk_arrived:
+            if xml is not None:
+                self._chunks[start] = list(xml)
+                self.buffered += len(self._chunks[start])
+                self.max_buffered = max(self.max_buffered, self.buffered)
+            else:
+                self._chunks[start] = None
+                self.successful = False
+            self.pending_counter.pop()
+            self._chunk_arrived.notify()
 
     def get(self, key, default=None):
         """
@@ -641,32 +704,63 @@ class DownloadGen(object):
         """
         return self.attrib.get(key, default)
 
+    def _next_chunk(self):
+        """
+        Makes the next chunk (in container order) the current one. Returns
+        False if that chunk has not been downloaded yet
+        """
+        with self._chunk_arrived:
+            if self._next_start not in self._chunks:
+                if self.pending_counter or not self._chunks:
+                    return False
+                # Should not happen - but do not stall on a gap
+                self._next_start = min(self._chunks)
+            chunk = self._chunks.pop(self._next_start)
+            self._next_start += CONTAINERSIZE
+        if chunk is not None:
+            self._current_chunk = deque(chunk)
+        return True
+
+    def _wait_for_chunk(self):
+        """
+        Blocks until the next chunk (or any download) has arrived. Returns
+        True if PKC needs to exit
+        """
+        with self._chunk_arrived:
+            if self._next_start not in self._chunks and self.pending_counter:
+                self._chunk_arrived.wait(ABORT_CHECK_INTERVAL)
+        return app.APP.monitor.abortRequested()
+
+    def _finished(self):
+        LOG.debug('Done iterating over %s items of %s, held at most %s items '
+                  'in memory', self.current, self.url, self.max_buffered)
+        if not self.successful:
+            raise RuntimeError('Could not download everything')
+        raise StopIteration()
+
     def __iter__(self):
         return self
 
     def __next__(self):
         while True:
             try:
-                child = self.xml[0]
+                child = self._current_chunk.popleft()
+            except IndexError:
+                if self._next_chunk():
+                    continue
+                if not self.pending_counter and not self._chunks:
+                    self._finished()
+            else:
                 self.current += 1
-                self.xml.remove(child)
+                with self._chunk_arrived:
+                    self.buffered -= 1
                 if (self.current % CONTAINERSIZE == 0 and
                         self.current <= self.total - (self.cache_factor - 1) * CONTAINERSIZE):
-                    self.pending_counter.append(None)
-                    self._downloader(
-                        self.url,
-                        self.args,
-                        self.current + (self.cache_factor - 1) * CONTAINERSIZE,
-                        self.on_chunk_downloaded)
+                    self._download(
+                        self.current + (self.cache_factor - 1) * CONTAINERSIZE)
                 return child
-            except IndexError:
-                if not self.pending_counter and not len(self.xml):
-                    if not self.successful:
-                        raise RuntimeError('Could not download everything')
-                    else:
-                        raise StopIteration()
             LOG.debug('Waiting for download to finish')
-            if app.APP.monitor.waitForAbort(0.1):
+            if self._wait_for_chunk():
                 raise StopIteration('PKC needs to exit now')
 
     next = __next__
@@ -978,6 +1072,7 @@ def scrobble(ratingKey, state):
         return
     DU().downloadUrl(utils.extend_url(url, args))
     LOG.info("Toggled watched state for Plex item %s", ratingKey)
+    response_cache.expire()
 
 
 def delete_item_from_pms(plexid):
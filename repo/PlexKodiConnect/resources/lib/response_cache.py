@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Persistent cache for the PMS responses we need for browsing Plex with the
+PKC plugin. Every plugin:// call runs in a separate Python instance (and
+skins re-evaluate widget paths all the time), hence the cache lives in a
+small sqlite DB.
+
+Responses are used without asking the PMS for RESPONSE_TTL seconds. After
+that, we revalidate them with the PMS using ETag/Last-Modified - if the PMS
+provided those. The PKC service expires all responses as soon as the PMS
+tells us via websocket that something changed.
+
+Responses are cached per PMS and per Plex user (using the user's PMS token).
+"""
+from logging import getLogger
+from hashlib import md5
+import sqlite3
+import time
+
+from .downloadutils import DownloadUtils as DU
+from . import utils, path_ops, variables as v, app
+
+LOG = getLogger('PLEX.response_cache')
+
+CACHE_PATH = path_ops.path.join(v.ADDON_PROFILE, 'responsecache.db')
+DB_CONNECTION_TIMEOUT = 10
+# Seconds we're using a response without asking the PMS
+RESPONSE_TTL = 60
+# Seconds we keep an expired response in order to revalidate it with the PMS
+# or to use it if the PMS cannot be reached
+STALE_TTL = 24 * 60 * 60
+# Max. size of all cached responses [bytes]. Least recently used responses
+# are deleted first
+MAX_CACHE_SIZE = 20 * 1024 * 1024
+
+
+class ResponseCache(object):
+    """
+    Use with a context manager:
+        with ResponseCache() as cache:
+            cache.get(key)
+    """
+    def __enter__(self):
+        self.conn = sqlite3.connect(CACHE_PATH,
+                                    timeout=DB_CONNECTION_TIMEOUT,
+                                    isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode = WAL;')
+        self.conn.execute('PRAGMA synchronous = NORMAL;')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses(
+                key TEXT PRIMARY KEY,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                fetch_time REAL,
+                size INTEGER,
+                expires REAL,
+                last_used REAL)
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS stats(
+                name TEXT PRIMARY KEY,
+                value REAL)
+        ''')
+        return self
+
+    def __exit__(self, e_typ, e_val, trcbak):
+        self.conn.close()
+
+    def get(self, key):
+        return self.conn.execute('SELECT * FROM responses WHERE key = ?',
+                                 (key, )).fetchone()
+
+    def set(self, key, body, etag, last_modified, fetch_time):
+        now = time.time()
+        self.conn.execute('''
+            INSERT OR REPLACE INTO responses(
+                key, body, etag, last_modified, fetch_time, size, expires,
+                last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (key, sqlite3.Binary(body), etag, last_modified, fetch_time,
+              len(body), now + RESPONSE_TTL, now))
+        self._shrink(now)
+
+    def refresh(self, key):
+        """
+        The PMS confirmed that our response is still valid
+        """
+        now = time.time()
+        self.conn.execute('''
+            UPDATE responses SET expires = ?, last_used = ? WHERE key = ?
+        ''', (now + RESPONSE_TTL, now, key))
+
+    def used(self, key):
+        self.conn.execute('UPDATE responses SET last_used = ? WHERE key = ?',
+                          (time.time(), key))
+
+    def expire(self):
+        """
+        Expires all responses - they will be revalidated with the PMS. Only
+        remembers the time of expiry, see is_fresh()
+        """
+        self.conn.execute('''
+            INSERT OR REPLACE INTO stats(name, value) VALUES ('expired_at', ?)
+        ''', (time.time(), ))
+
+    def is_fresh(self, entry, now):
+        """
+        Returns True if we can use the response entry without asking the PMS
+        """
+        if entry['expires'] <= now:
+            return False
+        row = self.conn.execute('''
+            SELECT value FROM stats WHERE name = 'expired_at'
+        ''').fetchone()
+        # The response was fetched or revalidated at expires - RESPONSE_TTL
+        return row is None or entry['expires'] - RESPONSE_TTL > row[0]
+
+    def count(self, name, value=1):
+        """
+        Adds value to the counter name, returns all counters as a dict
+        """
+        self.conn.execute('''
+            INSERT OR IGNORE INTO stats(name, value) VALUES (?, 0)
+        ''', (name, ))
+        self.conn.execute('UPDATE stats SET value = value + ? WHERE name = ?',
+                          (value, name))
+        return {x[0]: x[1] for x in self.conn.execute('SELECT * FROM stats')}
+
+    def _shrink(self, now):
+        self.conn.execute('DELETE FROM responses WHERE last_used < ?',
+                          (now - STALE_TTL, ))
+        size = 0
+        obsolete = []
+        for key, entry_size in self.conn.execute('''
+                SELECT key, size FROM responses ORDER BY last_used DESC
+                '''):
+            size += entry_size
+            if size > MAX_CACHE_SIZE:
+                obsolete.append((key, ))
+        if obsolete:
+            LOG.debug('Deleting %s least recently used responses',
+                      len(obsolete))
+            self.conn.executemany('DELETE FROM responses WHERE key = ?',
+                                  obsolete)
+
+
+def download(url):
+    """
+    Use instead of DU().downloadUrl(url) to GET a PMS xml for browsing.
+    Returns the xml or whatever DU().downloadUrl(url) returned
+    """
+    try:
+        return _download(url)
+    except sqlite3.Error as err:
+        LOG.warn('Response cache failed, downloading without it: %s', err)
+        return DU().downloadUrl(url)
+
+
+def expire():
+    """
+    Call if something changed on the PMS - will force us to revalidate all
+    cached responses with the PMS
+    """
+    try:
+        with ResponseCache() as cache:
+            cache.expire()
+    except sqlite3.Error as err:
+        LOG.warn('Could not expire the cached responses: %s', err)
+
+
+def _download(url):
+    # The plugin only loads the user's PMS token, not e.g. the Plex user id.
+    # Don't store the token itself
+    user = md5((app.ACCOUNT.pms_token or '').encode('utf-8')).hexdigest()
+    key = '%s|%s|%s' % (app.CONN.server, user, url)
+    start = time.time()
+    with ResponseCache() as cache:
+        entry = cache.get(key)
+        # A cached response we cannot parse is useless, fetch it again
+        cached_xml = _parse(entry['body']) if entry else None
+        if cached_xml is None:
+            entry = None
+        if entry and cache.is_fresh(entry, start):
+            cache.used(key)
+            cache.count('saved', entry['fetch_time'])
+            _log_stats(cache.count('hits'), 'hit', url)
+            return cached_xml
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        r = DU().downloadUrl(url,
+                             headerOptions=headers or None,
+                             return_response=True)
+        fetch_time = time.time() - start
+        if r is None:
+            if entry:
+                LOG.info('PMS unreachable, using expired response for %s', url)
+                return cached_xml
+            return
+        if r.status_code == 304 and entry:
+            cache.refresh(key)
+            cache.count('saved', max(entry['fetch_time'] - fetch_time, 0))
+            _log_stats(cache.count('revalidated'), 'revalidated', url)
+            return cached_xml
+        elif r.status_code == 200:
+            xml = _parse(r.content)
+            if xml is not None:
+                cache.set(key,
+                          r.content,
+                          r.headers.get('ETag'),
+                          r.headers.get('Last-Modified'),
+                          fetch_time)
+                _log_stats(cache.count('misses'), 'miss', url)
+                return xml
+    # Let downloadutils deal with anything else, e.g. 401 Unauthorized -
+    # without asking the PMS a second time
+    return DU().handleResponse(r, url)
+
+
+def _parse(body):
+    try:
+        return utils.etree.fromstring(bytes(body))
+    except Exception:
+        return None
+
+
+def _log_stats(stats, result, url):
+    hits = stats.get('hits', 0) + stats.get('revalidated', 0)
+    total = hits + stats.get('misses', 0)
+    LOG.info('Response cache %s for %s - hits: %d, revalidated: %d, '
+             'misses: %d, hit rate: %.0f%%, time saved: %.1fs',
+             result, url, stats.get('hits', 0), stats.get('revalidated', 0),
+             stats.get('misses', 0), 100.0 * hits / total if total else 0,
+             stats.get('saved', 0))
@@ -19,6 +19,7 @@ from . import app
 from . import loghandler
 from . import backgroundthread
 from . import skip_plex_intro
+from . import response_cache
 from .windows import userselect
 
 ###############################################################################
@@ -174,6 +175,8 @@ class Service(object):
         app.APP.suspend_threads()
         LOG.info('Successfully suspended threads')
         app.ACCOUNT.log_out()
+        # Make sure we're not showing the old user's cached PMS responses
+        response_cache.expire()
         LOG.info('User has been logged out')
 
     def choose_pms_server(self, manual=False):
@@ -505,6 +508,8 @@ class Service(object):
                     raise RuntimeError('Unknown command: %s', plex_command)
                 if task:
                     backgroundthread.BGThreader.addTasksToFront([task])
+                # e.g. a library scan might have been requested
+                app.APP.wake_up_sync_thread()
                 continue
 
             if app.APP.suspend:
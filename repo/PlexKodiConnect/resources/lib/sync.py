@@ -13,6 +13,12 @@ if library_sync.PLAYLIST_SYNC_ENABLED:
 
 LOG = getLogger('PLEX.sync')
 
+# Process stored websocket messages every x seconds
+WEBSOCKET_PROCESSING_INTERVAL = 5
+# Max. number of seconds to sleep when idling - we will be woken up earlier if
+# a websocket message arrives or a library scan is requested
+MAX_IDLE_SLEEP = 10
+
 
 class Sync(backgroundthread.KillableThread):
     """
@@ -118,9 +124,24 @@ class Sync(backgroundthread.KillableThread):
         self.image_cache_thread = artwork.ImageCachingThread()
         self.image_cache_thread.start()
 
+    def _idle_timeout(self, now, last_websocket_processing):
+        """
+        Returns the number of seconds the sync thread may sleep before it has
+        to do something on its own
+        """
+        timeout = MAX_IDLE_SLEEP
+        full_sync_due = self.last_full_sync + app.SYNC.full_sync_intervall - now
+        if full_sync_due > 0:
+            # Otherwise a full sync is overdue but we're e.g. playing a video
+            timeout = min(timeout, full_sync_due)
+        if library_sync.WEBSOCKET_MESSAGES:
+            timeout = min(timeout,
+                          last_websocket_processing + WEBSOCKET_PROCESSING_INTERVAL + 1 - now)
+        return max(timeout, 0.1)
+
     def run(self):
         LOG.info("---===### Starting Sync Thread ###===---")
-        app.APP.register_thread(self)
+        app.APP.register_sync_thread(self)
         try:
             self._run_internal()
         except Exception:
@@ -128,7 +149,7 @@ class Sync(backgroundthread.KillableThread):
             raise
         finally:
             try:
-                app.APP.deregister_thread(self)
+                app.APP.deregister_sync_thread(self)
             except ValueError:
                 pass
             LOG.info("###===--- Sync Thread Stopped ---===###")
@@ -149,7 +170,7 @@ class Sync(backgroundthread.KillableThread):
                 LOG.warn("Db version out of date: %s minimum version "
                          "required: %s", current_version, v.MIN_DB_VERSION)
                 # In order to not wait for this thread to suspend
-                app.APP.deregister_thread(self)
+                app.APP.deregister_sync_thread(self)
                 # DB out of date. Proceed to recreate?
                 if not utils.yesno_dialog(utils.lang(29999),
                                           utils.lang(39401)):
@@ -229,7 +250,7 @@ class Sync(backgroundthread.KillableThread):
                     # this once a while (otherwise, potentially many screen
                     # refreshes lead to flickering)
                     if (library_sync.WEBSOCKET_MESSAGES and
-                            now - last_websocket_processing > 5):
+                            now - last_websocket_processing > WEBSOCKET_PROCESSING_INTERVAL):
                         last_websocket_processing = now
                         library_sync.process_websocket_messages()
                     # See if there is a PMS message we need to handle
@@ -241,9 +262,12 @@ class Sync(backgroundthread.KillableThread):
                     else:
                         library_sync.store_websocket_message(message)
                         queue.task_done()
-                        # Sleep just a bit
-                        self.sleep(0.01)
                         continue
+                    # Nothing to do right now. Sleep until new work arrives
+                    # or we need to process stored messages or do a full sync
+                    self.wait_for_wake_up(self._idle_timeout(
+                        now, last_websocket_processing))
+                    continue
             self.sleep(0.1)
         # Shut down playlist monitoring
         if playlist_monitor:
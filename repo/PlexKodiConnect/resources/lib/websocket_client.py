@@ -62,6 +62,7 @@ def pms_on_message(ws, message):
     else:
         # Put PMS message on queue and let libsync take care of it
         app.APP.websocket_queue.put(message)
+        app.APP.wake_up_sync_thread()
 
 
 def alexa_on_message(ws, message):
@@ -24,6 +24,12 @@ APPEND_SXXEXX = None
 SYNCHED = True
 # Need to chain the PMS keys
 KEY = None
+# Kodi item details of the current listing, fetched in one go by
+# prefetch_kodi_details(). {(kodi_id, kodi_type): Kodi item dict}
+KODI_DETAILS = {}
+# Folders for which we're displaying Kodi library content as well
+CONTENT_FOLDER_TYPES = (v.PLEX_TYPE_SHOW, v.PLEX_TYPE_SEASON,
+                        v.PLEX_TYPE_ARTIST, v.PLEX_TYPE_ALBUM)
 
 
 def get_clean_image(image):
@@ -51,6 +57,22 @@ def get_clean_image(image):
         return image
 
 
+def prefetch_kodi_details(apis):
+    """
+    Fetches the Kodi library details of all items of a listing that are
+    synched to Kodi with one single JSON RPC call, instead of one call per
+    item in generate_item(). Pass in a list of API objects
+    """
+    kodi_items = []
+    for api in apis:
+        if (api.tag in ('Directory', 'Playlist', 'Hub') and
+                api.plex_type not in CONTENT_FOLDER_TYPES):
+            continue
+        if api.kodi_id:
+            kodi_items.append((api.kodi_id, api.kodi_type))
+    KODI_DETAILS.update(js.items_details(kodi_items))
+
+
 def generate_item(api):
     """
     Meant to be consumed by metadatautils.kodidb.prepare_listitem(), and then
@@ -127,7 +149,9 @@ def _generate_content(api):
     if api.kodi_id:
         # Item is synched to the Kodi db - let's use that info
         # (will thus e.g. include additional artwork or metadata)
-        item = js.item_details(api.kodi_id, api.kodi_type)
+        item = KODI_DETAILS.pop((api.kodi_id, api.kodi_type), None)
+        if item is None:
+            item = js.item_details(api.kodi_id, api.kodi_type)
 
     # In rare cases, Kodi's JSON reply does not provide 'title' plus potentially
     # other fields - let's use the PMS answer to be safe
@@ -16,8 +16,90 @@ else:
     from utils import try_parse_int, localdate_from_utc_string, localized_date_time
     from kodi_constants import *
 from operator import itemgetter
+import threading
+import time
 import arrow
 
+# rebuild the uniqueid indexes after this many seconds even if we did not get a library notification
+UNIQUEID_INDEX_MAX_AGE = 600
+
+
+class UniqueIdIndex(object):
+    """lazily built {uniqueid/imdbnumber: dbid} index of all movies or tvshows in the kodi db"""
+
+    def __init__(self, jsonmethod, returntype, idfield):
+        self.jsonmethod = jsonmethod
+        self.returntype = returntype
+        self.idfield = idfield
+        self._index = None
+        self._built = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """drop the index, it will be rebuilt on the next lookup"""
+        with self._lock:
+            self._index = None
+
+    def lookup(self, value):
+        """return the kodi dbid for the given uniqueid (e.g. imdb or tvdb id) or None"""
+        with self._lock:
+            if self._index is None or time.time() - self._built > UNIQUEID_INDEX_MAX_AGE:
+                self._index = self._build()
+                self._built = time.time()
+            return self._index.get(value)
+
+    def _build(self):
+        """fetch the ids of all items in one json call"""
+        _LibraryMonitor.start()
+        index = {}
+        if KODI_VERSION > 16:
+            # from Kodi 17 we have a uniqueid field instead of imdbnumber
+            for item in KodiDb.get_json(self.jsonmethod, fields=["uniqueid"], returntype=self.returntype):
+                for uniqueid in item.get("uniqueid", {}).values():
+                    index.setdefault(uniqueid, item[self.idfield])
+        else:
+            for item in KodiDb.get_json(self.jsonmethod, fields=["imdbnumber"], returntype=self.returntype):
+                index.setdefault(item["imdbnumber"], item[self.idfield])
+        log_msg("Built uniqueid index for %s %s" % (len(index), self.returntype))
+        return index
+
+
+UNIQUEID_INDEXES = {
+    "movie": UniqueIdIndex("VideoLibrary.GetMovies", "movies", "movieid"),
+    "tvshow": UniqueIdIndex("VideoLibrary.GetTvShows", "tvshows", "tvshowid")
+}
+
+
+class _LibraryMonitor(xbmc.Monitor):
+    """invalidates the uniqueid indexes if the kodi video library changes"""
+    _instance = None
+
+    @classmethod
+    def start(cls):
+        """make sure we are listening for notifications (only possible from within kodi)"""
+        if cls._instance is None:
+            cls._instance = cls()
+
+    def onNotification(self, sender, method, data):
+        """called by kodi"""
+        if method in ("VideoLibrary.OnScanFinished", "VideoLibrary.OnCleanFinished"):
+            for index in UNIQUEID_INDEXES.values():
+                index.invalidate()
+        elif method in ("VideoLibrary.OnUpdate", "VideoLibrary.OnRemove"):
+            try:
+                data = json.loads(data)
+            except Exception:
+                data = {}
+            if "playcount" in data:
+                # only the watched status changed
+                return
+            index = UNIQUEID_INDEXES.get(data.get("type", data.get("item", {}).get("type")))
+            if index:
+                index.invalidate()
+            elif not data:
+                for index in UNIQUEID_INDEXES.values():
+                    index.invalidate()
+
 
 class KodiDb(object):
     """various methods and helpers to get data from kodi json api"""
@@ -34,20 +116,10 @@ class KodiDb(object):
 
     def movie_by_imdbid(self, imdb_id):
         """gets a movie from kodidb by imdbid."""
-        # apparently you can't filter on imdb so we have to do this the complicated way
-        if KODI_VERSION > 16:
-            # from Kodi 17 we have a uniqueid field instead of imdbnumber
-            all_items = self.get_json('VideoLibrary.GetMovies', fields=["uniqueid"], returntype="movies")
-            for item in all_items:
-                if 'uniqueid' in item:
-                    for item2 in item["uniqueid"].values():
-                        if item2 == imdb_id:
-                            return self.movie(item["movieid"])
-        else:
-            all_items = self.get_json('VideoLibrary.GetMovies', fields=["imdbnumber"], returntype="movies")
-            for item in all_items:
-                if item["imdbnumber"] == imdb_id:
-                    return self.movie(item["movieid"])
+        # apparently you can't filter on imdb so we look it up in our own index
+        db_id = UNIQUEID_INDEXES["movie"].lookup(imdb_id)
+        if db_id is not None:
+            return self.movie(db_id)
         return {}
 
     def tvshow(self, db_id):
@@ -67,21 +139,10 @@ class KodiDb(object):
 
     def tvshow_by_imdbid(self, imdb_id):
         """gets a tvshow from kodidb by imdbid (or tvdbid)."""
-        # apparently you can't filter on imdb so we have to do this the complicated way
-        if KODI_VERSION > 16:
-            # from Kodi 17 we have a uniqueid field instead of imdbnumber
-            all_items = self.get_json('VideoLibrary.GetTvShows', fields=["uniqueid"], returntype="tvshows")
-            for item in all_items:
-                if 'uniqueid' in item:
-                    for item2 in item["uniqueid"].values():
-                        if item2 == imdb_id:
-                            return self.tvshow(item["tvshowid"])
-        else:
-            # pre-kodi 17 approach
-            all_items = self.get_json('VideoLibrary.GetTvShows', fields=["imdbnumber"], returntype="tvshows")
-            for item in all_items:
-                if item["imdbnumber"] == imdb_id:
-                    return self.tvshow(item["tvshowid"])
+        # apparently you can't filter on imdb so we look it up in our own index
+        db_id = UNIQUEID_INDEXES["tvshow"].lookup(imdb_id)
+        if db_id is not None:
+            return self.tvshow(db_id)
         return {}
 
     def episode(self, db_id):
@@ -9,19 +9,86 @@
 
 import os, sys
 if sys.version_info.major == 3:
-    from .utils import log_msg, extend_dict, ADDON_ID, strip_newlines, download_artwork, try_decode, manual_set_artwork
+    from .utils import log_msg, log_exception, extend_dict, ADDON_ID, strip_newlines, download_artwork, try_decode
+    from .utils import manual_set_artwork
     from .mbrainz import MusicBrainz
     from urllib.parse import quote_plus
 else:
-    from utils import log_msg, extend_dict, ADDON_ID, strip_newlines, download_artwork, try_decode, manual_set_artwork
+    from utils import log_msg, log_exception, extend_dict, ADDON_ID, strip_newlines, download_artwork, try_decode
+    from utils import manual_set_artwork
     from mbrainz import MusicBrainz
     from urllib import quote_plus
 import xbmc
 import xbmcvfs
 import xbmcgui
 from difflib import SequenceMatcher as SM
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import threading
+import time
 from simplecache import use_cache
 
+# max. number of concurrent online lookups, shared by all artist and album lookups
+PROVIDER_WORKERS = 8
+# seconds we wait for the providers of one artist or album before we ignore their results
+PROVIDER_TIMEOUT = 20
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor():
+    """the bounded thread pool all provider lookups run in"""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=PROVIDER_WORKERS)
+        return _EXECUTOR
+
+
+class ProviderLookups(object):
+    """concurrently running online lookups for one artist or album"""
+
+    def __init__(self, timeout=PROVIDER_TIMEOUT):
+        self.deadline = time.time() + timeout
+
+    @staticmethod
+    def submit(func, *args):
+        """start func(*args) in the background, returns a future"""
+        return get_executor().submit(func, *args)
+
+    def result(self, future):
+        """wait for the result of future - returns None if it failed or took too long"""
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=max(self.deadline - time.time(), 0))
+        except FutureTimeout:
+            future.cancel()
+            log_msg("Provider lookup timed out - ignoring its result")
+        except Exception as exc:
+            log_exception(__name__, exc)
+        return None
+
+    def first(self, futures):
+        """
+            the first non-empty result of futures, ordered by provider priority
+            lookups with a lower priority that are not needed anymore get cancelled
+        """
+        result = None
+        for count, future in enumerate(futures):
+            result = self.result(future)
+            if result:
+                self.cancel(futures[count + 1:])
+                break
+        return result
+
+    @staticmethod
+    def cancel(futures):
+        """cancel all futures that did not start yet - the results of the running ones get ignored"""
+        for future in futures:
+            if future is not None:
+                future.cancel()
+
 
 class MusicArtwork(object):
     """get metadata and artwork for music"""
@@ -188,19 +255,26 @@ class MusicArtwork(object):
                 if not album and not track:
                     album = details.get("ref_album")
                     track = details.get("ref_track")
+                lookups = ProviderLookups()
+                # theaudiodb only needs the artist name - start right away
+                adb_info = None
+                if self._mutils.addon.getSetting("music_art_scraper_adb") == "true":
+                    adb_info = lookups.submit(self.audiodb.artist_info, artist)
                 # prefer the musicbrainzid that is already in the kodi database - only perform lookup if missing
-                mb_artistid = details.get("musicbrainzartistid", self.get_mb_artist_id(artist, album, track))
+                mb_artistid = details.get("musicbrainzartistid") or self.get_mb_artist_id(artist, album, track)
                 details["musicbrainzartistid"] = mb_artistid
                 if mb_artistid:
-                    # get artwork from fanarttv
+                    # query all providers at once
+                    fatv_art = None
                     if self._mutils.addon.getSetting("music_art_scraper_fatv") == "true":
-                        details["art"] = extend_dict(details["art"], self._mutils.fanarttv.artist(mb_artistid))
-                    # get metadata from theaudiodb
-                    if self._mutils.addon.getSetting("music_art_scraper_adb") == "true":
-                        details = extend_dict(details, self.audiodb.artist_info(artist))
-                    # get metadata from lastfm
+                        fatv_art = lookups.submit(self._mutils.fanarttv.artist, mb_artistid)
+                    lfm_info = None
                     if self._mutils.addon.getSetting("music_art_scraper_lfm") == "true":
-                        details = extend_dict(details, self.lastfm.artist_info(mb_artistid))
+                        lfm_info = lookups.submit(self.lastfm.artist_info, mb_artistid)
+                    # merge by provider priority: fanarttv, theaudiodb, lastfm
+                    details["art"] = extend_dict(details["art"], lookups.result(fatv_art))
+                    details = extend_dict(details, lookups.result(adb_info))
+                    details = extend_dict(details, lookups.result(lfm_info))
                     # download artwork to music folder
                     if local_path and self._mutils.addon.getSetting("music_art_download") == "true":
                         details["art"] = download_artwork(local_path, details["art"])
@@ -277,25 +351,34 @@ class MusicArtwork(object):
                 details["customartpath"] = local_path_custom
             # lookup online metadata
             if self._mutils.addon.getSetting("music_art_scraper") == "true":
+                lookups = ProviderLookups()
+                use_adb = self._mutils.addon.getSetting("music_art_scraper_adb") == "true"
                 # prefer the musicbrainzid that is already in the kodi database - only perform lookup if missing
                 mb_albumid = details.get("musicbrainzalbumid")
+                adb_album = album
                 if not mb_albumid:
+                    adb_album_id = lookups.submit(self.audiodb.get_album_id, artist, album, track) if use_adb else None
                     mb_albumid = self.get_mb_album_id(artist, album, track)
-                    if self._mutils.addon.getSetting("music_art_scraper_adb") == "true":
-                        adb_album = self.audiodb.get_album_id(artist, album, track)
+                    adb_album = lookups.result(adb_album_id) or album
                 if mb_albumid:
-                    # get artwork from fanarttv
+                    # query all providers at once
+                    fatv_art = None
                     if self._mutils.addon.getSetting("music_art_scraper_fatv") == "true":
-                        details["art"] = extend_dict(details["art"], self._mutils.fanarttv.album(mb_albumid))
-                    # get metadata from theaudiodb
-                    if self._mutils.addon.getSetting("music_art_scraper_adb") == "true":
-                        details = extend_dict(details, self.audiodb.album_info(artist, adb_album))
-                    # get metadata from lastfm
+                        fatv_art = lookups.submit(self._mutils.fanarttv.album, mb_albumid)
+                    adb_info = lookups.submit(self.audiodb.album_info, artist, adb_album) if use_adb else None
+                    lfm_info = None
                     if self._mutils.addon.getSetting("music_art_scraper_lfm") == "true":
-                        details = extend_dict(details, self.lastfm.album_info(mb_albumid))
-                    # metadata from musicbrainz
+                        lfm_info = lookups.submit(self.lastfm.album_info, mb_albumid)
+                    # musicbrainz is only used if the others don't know year or genre
+                    mb_info = lookups.submit(self.mbrainz.get_albuminfo, mb_albumid)
+                    # merge by provider priority: fanarttv, theaudiodb, lastfm, musicbrainz
+                    details["art"] = extend_dict(details["art"], lookups.result(fatv_art))
+                    details = extend_dict(details, lookups.result(adb_info))
+                    details = extend_dict(details, lookups.result(lfm_info))
                     if not details.get("year") or not details.get("genre"):
-                        details = extend_dict(details, self.mbrainz.get_albuminfo(mb_albumid))
+                        details = extend_dict(details, lookups.result(mb_info))
+                    else:
+                        lookups.cancel([mb_info])
                     # musicbrainz thumb as last resort
                     if not details["art"].get("thumb"):
                         details["art"]["thumb"] = self.mbrainz.get_albumthumb(mb_albumid)
@@ -452,21 +535,22 @@ class MusicArtwork(object):
 
     def get_mb_artist_id(self, artist, album, track):
         """lookup musicbrainz artist id with query of artist and album/track"""
-        artistid = self.mbrainz.get_artist_id(artist, album, track)
-        if not artistid and self._mutils.addon.getSetting("music_art_scraper_lfm") == "true":
-            artistid = self.lastfm.get_artist_id(artist, album, track)
-        if not artistid and self._mutils.addon.getSetting("music_art_scraper_adb") == "true":
-            artistid = self.audiodb.get_artist_id(artist, album, track)
-        return artistid
+        return self._get_mb_id("get_artist_id", artist, album, track)
 
     def get_mb_album_id(self, artist, album, track):
         """lookup musicbrainz album id with query of artist and album/track"""
-        albumid = self.mbrainz.get_album_id(artist, album, track)
-        if not albumid and self._mutils.addon.getSetting("music_art_scraper_lfm") == "true":
-            albumid = self.lastfm.get_album_id(artist, album, track)
-        if not albumid and self._mutils.addon.getSetting("music_art_scraper_adb") == "true":
-            albumid = self.audiodb.get_album_id(artist, album, track)
-        return albumid
+        return self._get_mb_id("get_album_id", artist, album, track)
+
+    def _get_mb_id(self, method, artist, album, track):
+        """ask musicbrainz, lastfm and theaudiodb at once - first one (in that order) with a result wins"""
+        providers = [self.mbrainz]
+        if self._mutils.addon.getSetting("music_art_scraper_lfm") == "true":
+            providers.append(self.lastfm)
+        if self._mutils.addon.getSetting("music_art_scraper_adb") == "true":
+            providers.append(self.audiodb)
+        lookups = ProviderLookups()
+        return lookups.first([lookups.submit(getattr(provider, method), artist, album, track)
+                              for provider in providers])
 
     def manual_set_music_artwork(self, details, mediatype):
         """manual override artwork options"""
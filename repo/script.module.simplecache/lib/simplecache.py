@@ -12,9 +12,86 @@ import datetime
 import time
 import sqlite3
 import json
-from functools import reduce
+import pickle
+import threading
+import hashlib
+from collections import OrderedDict
 
 ADDON_ID = "script.module.simplecache"
+# limits for the in-process memory cache (number of entries and total bytes)
+MEM_CACHE_MAX_ITEMS = 2000
+MEM_CACHE_MAX_BYTES = 16 * 1024 * 1024
+# version of the _database layout, stored as PRAGMA user_version
+# 1: checksums are blake2b hashes instead of the sum of all character ordinals
+DB_VERSION = 1
+
+# one persistent _database connection per thread, shared by all instances
+_DB_CONNECTIONS = threading.local()
+
+
+class MemoryCache(object):
+    '''
+        bounded, size-aware LRU cache that lives in our process
+        holds the already parsed value of a window property so we can skip the (slow) eval/json parsing
+        an entry is only used if the window property still holds the exact same string
+        values are stored pickled so every caller gets its own copy, just like with eval
+    '''
+
+    def __init__(self, max_items=MEM_CACHE_MAX_ITEMS, max_bytes=MEM_CACHE_MAX_BYTES):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, cachedata_str):
+        '''return the parsed value for cachedata_str or None if we do not have it'''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != cachedata_str:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(entry[1])
+
+    def set(self, key, cachedata_str, cachedata):
+        '''store the parsed value cachedata of window property string cachedata_str'''
+        try:
+            blob = pickle.dumps(cachedata, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        size = len(cachedata_str) + len(blob)
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._data[key] = (cachedata_str, blob, size)
+            self.size += size
+            while len(self._data) > self.max_items or self.size > self.max_bytes:
+                self.size -= self._data.popitem(last=False)[1][2]
+                self.evictions += 1
+
+    def clear(self):
+        '''remove all entries'''
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def __repr__(self):
+        return "MemoryCache(entries: %s, bytes: %s, hits: %s, misses: %s, evictions: %s)" % (
+            len(self._data), self.size, self.hits, self.misses, self.evictions)
+
+
+_MEM_CACHE = MemoryCache()
 
 class SimpleCache(object):
     '''simple stateless caching system for Kodi'''
@@ -26,6 +103,13 @@ class SimpleCache(object):
     _win = None
     _busy_tasks = []
     _database = None
+    # optional cap for the size of the _database in bytes, 0 = unlimited
+    max_db_size = 0
+    # cleanup deletes this many rows per query and gives up after this many seconds
+    _cleanup_slice_size = 1000
+    _cleanup_max_duration = 10
+    # free pages are only given back once they make up this share of the _database
+    _vacuum_free_ratio = 0.25
 
     def __init__(self):
         '''Initialize our caching class'''
@@ -42,7 +126,7 @@ class SimpleCache(object):
             xbmc.sleep(25)
         del self._win
         del self._monitor
-        self._log_msg("Closed")
+        self._log_msg("Closed - %s" % _MEM_CACHE)
 
     def __del__(self):
         '''make sure close is called'''
@@ -104,13 +188,16 @@ class SimpleCache(object):
             we use window properties because we need to be stateless
         '''
         result = None
-        cachedata = self._win.getProperty(endpoint)
-
-        if cachedata:
-            if json_data or self.data_is_json:
-                cachedata = json.loads(cachedata)
-            else:
-                cachedata = eval(cachedata)
+        cachedata_str = self._win.getProperty(endpoint)
+
+        if cachedata_str:
+            cachedata = _MEM_CACHE.get(endpoint, cachedata_str)
+            if cachedata is None:
+                if json_data or self.data_is_json:
+                    cachedata = json.loads(cachedata_str)
+                else:
+                    cachedata = eval(cachedata_str)
+                _MEM_CACHE.set(endpoint, cachedata_str, cachedata)
             if cachedata[0] > cur_time:
                 if not checksum or checksum == cachedata[2]:
                     result = cachedata[1]
@@ -127,6 +214,7 @@ class SimpleCache(object):
         else:
             cachedata_str = repr(cachedata)
         self._win.setProperty(endpoint, cachedata_str)
+        _MEM_CACHE.set(endpoint, cachedata_str, cachedata)
 
 
     def _get_db_cache(self, endpoint, checksum, cur_time, json_data):
@@ -157,45 +245,153 @@ class SimpleCache(object):
         self._execute_sql(query, (endpoint, expires, data, checksum))
 
     def _do_cleanup(self):
-        '''perform cleanup task'''
+        '''
+            perform cleanup task
+            expired rows are deleted in small slices using the index on expires, so we never lock the _database
+            for long and stop as soon as our time budget is used up - leftovers are removed on the next run
+            the window properties of the remaining rows are cleared last, the next run continues where this one stopped
+        '''
         if self._exit or self._monitor.abortRequested():
             return
+        if self._win.getProperty("simplecachecleanbusy"):
+            return
         self._busy_tasks.append(__name__)
+        self._win.setProperty("simplecachecleanbusy", "busy")
         cur_time = datetime.datetime.now()
         cur_timestamp = self._get_timestamp(cur_time)
         self._log_msg("Running cleanup...")
-        if self._win.getProperty("simplecachecleanbusy"):
-            return
-        self._win.setProperty("simplecachecleanbusy", "busy")
-
-        query = "SELECT id, expires FROM simplecache"
-        for cache_data in self._execute_sql(query).fetchall():
-            cache_id = cache_data[0]
-            cache_expires = cache_data[1]
-
-            if self._exit or self._monitor.abortRequested():
+        deadline = time.time() + self._cleanup_max_duration
+        try:
+            # clean up db cache objects only if expired
+            query = "SELECT rowid, id FROM simplecache WHERE expires < ? LIMIT %s" % self._cleanup_slice_size
+            if not self._delete_slices(query, (cur_timestamp,), deadline):
+                return
+            # optional cap on the _database size: evict the entries that expire first
+            if self.max_db_size:
+                query = "SELECT rowid, id FROM simplecache ORDER BY expires LIMIT %s" % self._cleanup_slice_size
+                if not self._delete_slices(query, None, deadline, self._db_size_exceeded):
+                    return
+            self._vacuum()
+            # cleanup all memory objects on each interval
+            if not self._clear_mem_cache(deadline):
                 return
+        finally:
+            # remove task from list
+            self._busy_tasks.remove(__name__)
+            self._win.setProperty("simplecache.clean.lastexecuted", repr(cur_time))
+            self._win.clearProperty("simplecachecleanbusy")
+        self._log_msg("Auto cleanup done")
 
-            # always cleanup all memory objects on each interval
-            self._win.clearProperty(cache_id)
+    def _cleanup_aborted(self, deadline):
+        '''check if cleanup should stop now'''
+        if self._exit or self._monitor.abortRequested():
+            return True
+        if time.time() > deadline:
+            self._log_msg("Cleanup time budget used up, continuing on next run")
+            return True
+        return False
 
-            # clean up db cache object only if expired
-            if cache_expires < cur_timestamp:
-                query = 'DELETE FROM simplecache WHERE id = ?'
-                self._execute_sql(query, (cache_id,))
-                self._log_msg("delete from db %s" % cache_id)
+    def _clear_mem_cache(self, deadline):
+        '''
+            clear the window properties of all cache objects, walking the _database in slices
+            if the time budget is used up, the next run resumes at the last rowid we got to
+        '''
+        _MEM_CACHE.clear()
+        query = "SELECT rowid, id FROM simplecache WHERE rowid > ? ORDER BY rowid LIMIT %s" % self._cleanup_slice_size
+        last_rowid = int(self._win.getProperty("simplecache.clean.lastrowid") or 0)
+        while not self._cleanup_aborted(deadline):
+            cache_data = self._execute_sql(query, (last_rowid,))
+            rows = cache_data.fetchall() if cache_data else []
+            for last_rowid, cache_id in rows:
+                self._win.clearProperty(cache_id)
+            if len(rows) < self._cleanup_slice_size:
+                self._win.clearProperty("simplecache.clean.lastrowid")
+                return True
+        self._win.setProperty("simplecache.clean.lastrowid", str(last_rowid))
+        return False
+
+    def _delete_slices(self, query, data, deadline, condition=None):
+        '''
+            delete the rows (and their window properties) returned by a "SELECT rowid, id" query with a limit of
+            _cleanup_slice_size rows until it does not return anything anymore (or condition returns False).
+            Returns False if the cleanup has been aborted
+        '''
+        while condition is None or condition():
+            if self._cleanup_aborted(deadline):
+                return False
+            cursor = self._execute_sql(query, data)
+            rows = cursor.fetchall() if cursor else []
+            for _, cache_id in rows:
+                self._win.clearProperty(cache_id)
+            if rows:
+                # rowids are integers, no need for (too many) sql variables
+                cursor = self._execute_sql("DELETE FROM simplecache WHERE rowid IN (%s)"
+                                           % ",".join(str(row[0]) for row in rows))
+            if not cursor or len(rows) < self._cleanup_slice_size:
+                break
+            # give others a chance to access the _database
+            self._monitor.waitForAbort(0.01)
+        return True
+
+    def _get_pragma(self, name):
+        '''return the integer value of a sqlite PRAGMA - None if it could not be read'''
+        cursor = self._execute_sql("PRAGMA %s" % name)
+        row = cursor.fetchone() if cursor else None
+        return row[0] if row else None
+
+    def _get_pragmas(self, *names):
+        '''return the values of some sqlite PRAGMAs - None if any of them could not be read'''
+        values = [self._get_pragma(name) for name in names]
+        return None if None in values else values
+
+    def _db_size_exceeded(self):
+        '''check if the data in our _database (without free pages) exceeds max_db_size'''
+        pragmas = self._get_pragmas("page_count", "freelist_count", "page_size")
+        if pragmas is None:
+            return False
+        page_count, freelist_count, page_size = pragmas
+        return (page_count - freelist_count) * page_size > self.max_db_size
+
+    def _vacuum(self):
+        '''
+            only occasionally give free pages back to the filesystem, using auto_vacuum=INCREMENTAL
+            _databases created before that need a single full VACUUM to switch over
+        '''
+        pragmas = self._get_pragmas("auto_vacuum", "freelist_count", "page_count")
+        if pragmas is None:
+            # e.g. the _database is busy, we'll see on the next run
+            return
+        auto_vacuum, freelist_count, page_count = pragmas
+        if auto_vacuum != 2:
+            self._log_msg("Switching _database to incremental vacuum")
+            self._execute_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            self._execute_sql("VACUUM")
+        elif freelist_count > page_count * self._vacuum_free_ratio:
+            cursor = self._execute_sql("PRAGMA incremental_vacuum")
+            if cursor:
+                cursor.fetchall()
 
-        # compact db
-        self._execute_sql("VACUUM")
+    def _get_database(self):
+        '''get the persistent _database connection of the current thread'''
+        connection = getattr(_DB_CONNECTIONS, "connection", None)
+        if connection is None:
+            connection = self._open_database()
+            _DB_CONNECTIONS.connection = connection
+        return connection
 
-        # remove task from list
-        self._busy_tasks.remove(__name__)
-        self._win.setProperty("simplecache.clean.lastexecuted", repr(cur_time))
-        self._win.clearProperty("simplecachecleanbusy")
-        self._log_msg("Auto cleanup done")
+    @staticmethod
+    def _close_database():
+        '''close the _database connection of the current thread, a new one will be opened on next use'''
+        connection = getattr(_DB_CONNECTIONS, "connection", None)
+        _DB_CONNECTIONS.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
 
-    def _get_database(self):
-        '''get reference to our sqllite _database - performs basic integrity check'''
+    def _open_database(self):
+        '''open a new connection to our sqllite _database - performs basic integrity check'''
         addon = xbmcaddon.Addon(ADDON_ID)
         dbpath = addon.getAddonInfo('profile')
         dbfile = xbmcvfs.translatePath("%s/simplecache.db" % dbpath)
@@ -206,50 +402,98 @@ class SimpleCache(object):
         try:
             connection = sqlite3.connect(dbfile, timeout=30, isolation_level=None)
             connection.execute('SELECT * FROM simplecache LIMIT 1')
-            return connection
-        except Exception as error:
+        except sqlite3.DatabaseError as error:
+            if "database is locked" in str(error):
+                # another simplecache instance is busy with the _database - try again on next use
+                self._log_msg("Database is locked, retrying later: %s" % str(error), xbmc.LOGWARNING)
+                connection.close()
+                return None
             # our _database is corrupt or doesn't exist yet, we simply try to recreate it
             if xbmcvfs.exists(dbfile):
                 xbmcvfs.delete(dbfile)
             try:
                 connection = sqlite3.connect(dbfile, timeout=30, isolation_level=None)
+                # needs to be set before the first table is created
+                connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
                 connection.execute(
                     """CREATE TABLE IF NOT EXISTS simplecache(
                     id TEXT UNIQUE, expires INTEGER, data TEXT, checksum INTEGER)""")
+                connection.execute('CREATE INDEX IF NOT EXISTS simplecache_expires ON simplecache(expires)')
+                connection.execute('PRAGMA user_version = %s' % DB_VERSION)
                 return connection
             except Exception as error:
                 self._log_msg("Exception while initializing _database: %s" % str(error), xbmc.LOGWARNING)
                 self.close()
                 return None
+        self._update_schema(connection)
+        return connection
+
+    def _update_schema(self, connection):
+        '''schema changes of newer simplecache versions - may take a while and may fail if the db is busy'''
+        try:
+            connection.execute('CREATE INDEX IF NOT EXISTS simplecache_expires ON simplecache(expires)')
+        except sqlite3.OperationalError as error:
+            # e.g. locked by another simplecache instance, we'll try again when opening the next connection
+            self._log_msg("Could not create index, retrying later: %s" % str(error), xbmc.LOGWARNING)
+        try:
+            self._migrate_database(connection)
+        except sqlite3.OperationalError as error:
+            # user_version is only bumped after the migration succeeded, so it's simply done again next time
+            self._log_msg("Could not migrate _database, retrying later: %s" % str(error), xbmc.LOGWARNING)
+
+    def _migrate_database(self, connection):
+        '''bring a _database created by an older version of simplecache up to date'''
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if version >= DB_VERSION:
+            return
+        self._log_msg("Migrating _database from version %s to %s" % (version, DB_VERSION))
+        # one transaction, so the migration is either done completely or not at all
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if version < 1:
+                # old checksums can't be converted as we don't know the original strings
+                # these entries would never match again - entries without checksum (0) stay valid
+                connection.execute('DELETE FROM simplecache WHERE checksum != 0')
+            connection.execute('PRAGMA user_version = %s' % DB_VERSION)
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
 
     def _execute_sql(self, query, data=None):
         '''little wrapper around execute and executemany to just retry a db command if db is locked'''
         retries = 0
         result = None
         error = None
-        # always use new db object because we need to be sure that data is available for other simplecache instances
-        with self._get_database() as _database:
-            while not retries == 10 and not self._monitor.abortRequested():
-                if self._exit:
-                    return None
-                try:
-                    if isinstance(data, list):
-                        result = _database.executemany(query, data)
-                    elif data:
-                        result = _database.execute(query, data)
-                    else:
-                        result = _database.execute(query)
-                    return result
-                except sqlite3.OperationalError as error:
-                    if "_database is locked" in error:
-                        self._log_msg("retrying DB commit...")
-                        retries += 1
-                        self._monitor.waitForAbort(0.5)
-                    else:
-                        break
-                except Exception as error:
+        # the connection is in autocommit mode, so data is immediately available for other simplecache instances
+        _database = self._get_database()
+        if _database is None:
+            return None
+        while not retries == 10 and not self._monitor.abortRequested():
+            if self._exit:
+                return None
+            try:
+                if isinstance(data, list):
+                    result = _database.executemany(query, data)
+                elif data:
+                    result = _database.execute(query, data)
+                else:
+                    result = _database.execute(query)
+                return result
+            except sqlite3.OperationalError as exc:
+                error = exc
+                if "database is locked" in str(error):
+                    self._log_msg("retrying DB commit...")
+                    retries += 1
+                    self._monitor.waitForAbort(0.5)
+                else:
                     break
-            self._log_msg("_database ERROR ! -- %s" % str(error), xbmc.LOGWARNING)
+            except Exception as exc:
+                error = exc
+                break
+        self._log_msg("_database ERROR ! -- %s" % str(error), xbmc.LOGWARNING)
+        # start over with a fresh connection next time
+        self._close_database()
         return None
 
     @staticmethod
@@ -263,14 +507,23 @@ class SimpleCache(object):
         return int(time.mktime(date_time.timetuple()))
 
     def _get_checksum(self, stringinput):
-        '''get int checksum from string'''
+        '''get int checksum from string - used by get, set and thus also the use_cache decorator'''
         if not stringinput and not self.global_checksum:
             return 0
         if self.global_checksum:
             stringinput = "%s-%s" %(self.global_checksum, stringinput)
         else:
             stringinput = str(stringinput)
-        return reduce(lambda x, y: x + y, map(ord, stringinput))
+        return _hash_checksum(stringinput)
+
+
+def _hash_checksum(stringinput):
+    '''
+        64bit blake2b hash of stringinput as a signed integer, so it fits into a sqlite INTEGER column
+        unlike the sum of all character ordinals, permutations of the same characters do not collide
+    '''
+    digest = hashlib.blake2b(stringinput.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True) or 1
 
 
 def use_cache(cache_days=14):
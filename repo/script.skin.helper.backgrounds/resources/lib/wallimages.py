@@ -14,8 +14,14 @@ import xbmcvfs
 import random
 import io
 import sys
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 WALLS_PATH = "special://profile/addon_data/script.skin.helper.backgrounds/wall_backgrounds/"
+# downscaled source images (tiles), reused for every wall and every rebuild as long as the source is unchanged
+THUMBS_PATH = WALLS_PATH + "thumbs/"
+# number of threads decoding source images while building a wall
+WALL_WORKERS = 3
 
 # IMPORT PIL/PILLOW ###################################
 SUPPORTS_PIL = False
@@ -168,51 +174,100 @@ class WallImages():
             while len(wall_images) < images_required:
                 wall_images += wall_images
 
-            for count in range(self.max_wallimages):
-                if self.exit:
-                    return []
-                random.shuffle(wall_images)
-                img_canvas = Image.new("RGBA", (img_width * img_columns, img_height * img_rows))
-                img_count = 0
-                for x in range(img_rows):
-                    for y in range(img_columns):
-                        file = xbmcvfs.File(wall_images[img_count])
-                        try:
-                            img_obj = io.BytesIO(bytearray(file.readBytes()))
-                            img = Image.open(img_obj)
-                            xbmc.sleep(500)
-                            img = img.resize(size)
+            thumbs_path = "%s%s/" % (THUMBS_PATH, win_prop)
+            if not xbmcvfs.exists(thumbs_path):
+                xbmcvfs.mkdirs(thumbs_path)
+            with ThreadPoolExecutor(max_workers=WALL_WORKERS) as executor:
+                # the thumb names of the (unique) source images, only these thumbs are kept
+                sources = list(set(wall_images))
+                thumbs = dict(zip(sources, executor.map(lambda image: self.get_thumb(image, size), sources)))
+                for count in range(self.max_wallimages):
+                    if self.exit:
+                        return []
+                    random.shuffle(wall_images)
+                    img_canvas = Image.new("RGBA", (img_width * img_columns, img_height * img_rows))
+                    # decode every source only once per wall, a source can be on the wall more than once
+                    tiles = {}
+                    for image in wall_images[:images_required]:
+                        if image not in tiles:
+                            tiles[image] = executor.submit(self.get_tile, image, thumbs[image], size, thumbs_path)
+                    for img_count, image in enumerate(wall_images[:images_required]):
+                        img = tiles[image].result()
+                        if img:
+                            x, y = divmod(img_count, img_columns)
                             img_canvas.paste(img, (y * img_width, x * img_height))
-                            del img
-                            del img_obj
-                        except Exception:
-                            log_msg("Invalid image file found! --> %s" % wall_images[img_count], xbmc.LOGINFO)
-                        finally:
-                            file.close()
-                            img_count += 1
+                    del tiles
 
-                # save the files..
-                out_file = "%s%s.%s.jpg" % (WALLS_PATH, win_prop, count)
-                out_file = xbmcvfs.translatePath(out_file)
-                if xbmcvfs.exists(out_file):
-                    xbmcvfs.delete(out_file)
-                    xbmc.sleep(500)
-                img_canvas = img_canvas.convert("RGB")					
-                img_canvas.save(out_file, "JPEG")
+                    # save the files..
+                    out_file = "%s%s.%s.jpg" % (WALLS_PATH, win_prop, count)
+                    out_file = xbmcvfs.translatePath(out_file)
+                    if xbmcvfs.exists(out_file):
+                        xbmcvfs.delete(out_file)
+                    img_canvas = img_canvas.convert("RGB")
+                    img_canvas.save(out_file, "JPEG")
 
-                out_file_bw = "%s%s_BW.%s.jpg" % (WALLS_PATH, win_prop, count)
-                out_file_bw = xbmcvfs.translatePath(out_file_bw)
-                if xbmcvfs.exists(out_file_bw):
-                    xbmcvfs.delete(out_file_bw)
+                    out_file_bw = "%s%s_BW.%s.jpg" % (WALLS_PATH, win_prop, count)
+                    out_file_bw = xbmcvfs.translatePath(out_file_bw)
+                    if xbmcvfs.exists(out_file_bw):
+                        xbmcvfs.delete(out_file_bw)
+                    img_canvas = img_canvas.convert("L")
+                    img_canvas.save(out_file_bw, "JPEG")
+                    del img_canvas
+                    # add our images to the dict
+                    return_images.append({"wall": out_file, "wallbw": out_file_bw})
+                    # give kodi some air between the walls
                     xbmc.sleep(500)
-                img_canvas = img_canvas.convert("L")
-                img_canvas.save(out_file_bw, "JPEG")
-                del img_canvas
-                # add our images to the dict
-                return_images.append({"wall": out_file, "wallbw": out_file_bw})
+            self.cleanup_thumbs(thumbs_path, set(thumbs.values()))
         log_msg("Building Wall background %s DONE" % win_prop)
         return return_images
 
+    @staticmethod
+    def get_thumb(image, size):
+        '''returns the thumb filename of a source image, keyed by source path, modification time and tile size'''
+        try:
+            mtime = xbmcvfs.Stat(image).st_mtime()
+            return "%s.jpg" % hashlib.md5(("%s|%s|%sx%s" % (image, mtime, size[0], size[1])).encode("utf-8")).hexdigest()
+        except Exception:
+            return None
+
+    @staticmethod
+    def get_tile(image, thumb, size, thumbs_path):
+        '''
+            get a source image downscaled to the tile size, from the thumbs cache if the source is unchanged
+            returns the image (None for invalid images)
+        '''
+        try:
+            thumb_path = xbmcvfs.translatePath(thumbs_path + thumb) if thumb else None
+            if thumb_path and xbmcvfs.exists(thumb_path):
+                img = Image.open(thumb_path)
+                img.load()
+                return img
+            file = xbmcvfs.File(image)
+            try:
+                img_obj = io.BytesIO(bytearray(file.readBytes()))
+            finally:
+                file.close()
+            img = Image.open(img_obj)
+            # let the jpeg decoder downscale while decoding, which is a lot faster than decoding the full image
+            img.draft("RGB", size)
+            img = img.convert("RGB").resize(size)
+            if thumb_path:
+                # write to a temp file first, so no other build ever reads a half written thumb
+                tmp_path = thumb_path + ".tmp"
+                img.save(tmp_path, "JPEG", quality=90)
+                xbmcvfs.rename(tmp_path, thumb_path)
+            return img
+        except Exception:
+            log_msg("Invalid image file found! --> %s" % image, xbmc.LOGINFO)
+            return None
+
+    @staticmethod
+    def cleanup_thumbs(thumbs_path, valid_thumbs):
+        '''remove the thumbs of source images which are gone or changed (and leftover temp files)'''
+        for file in xbmcvfs.listdir(thumbs_path)[1]:
+            if file not in valid_thumbs:
+                xbmcvfs.delete(thumbs_path + file)
+
     def set_manualwall(self, win_prop, limit=20):
         '''set a manual wall by providing the skinner randomly changing images in window props'''
         images = self.bgupdater.get_images_from_vfspath(self.bgupdater.all_backgrounds_keys[win_prop])
@@ -9,21 +9,134 @@
 
 import os, sys
 import threading
+import time
+from collections import OrderedDict
 if sys.version_info.major == 3:
     import _thread as thread
+    import queue
 else:
     import thread
+    import Queue as queue
 from resources.lib.utils import log_msg, log_exception, get_current_content_type, kodi_json, prepare_win_props, merge_dict, getCondVisibility, try_decode
 import xbmc
 from simplecache import SimpleCache
 
+INFO_DIALOGS = ("Window.IsActive(movieinformation)|Window.IsActive(DialogPVRInfo.xml)|"
+                "Window.IsActive(DialogMusicInfo.xml)|Window.IsActive(script-script.extendedinfo-DialogVideoInfo.xml)")
+MUSIC_CONTENT = ("albums", "artists", "songs")
+PVR_CONTENT = ("tvchannels", "tvrecordings", "channels", "recordings", "timers", "tvtimers")
+
+
+class DetailsCache(object):
+    '''
+        size- and age-bounded memory cache for the window props of listitems
+        every content group (video, music, pvr) has its own quota of (approximate) bytes,
+        the least recently used listitems of a group are evicted first
+    '''
+    # approximate bytes per cached entry and window property on top of the actual strings
+    entry_overhead = 200
+    prop_overhead = 100
+
+    def __init__(self, max_age=1800, quotas=None):
+        self.max_age = max_age
+        self.quotas = quotas or {"video": 8 * 1024 * 1024, "music": 4 * 1024 * 1024, "pvr": 2 * 1024 * 1024}
+        self.groups = dict((group, OrderedDict()) for group in self.quotas)
+        self.sizes = dict((group, 0) for group in self.quotas)
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0, "expired": 0}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_group(content_type):
+        '''the content group a contenttype is accounted to'''
+        if content_type in MUSIC_CONTENT:
+            return "music"
+        if content_type in PVR_CONTENT:
+            return "pvr"
+        return "video"
+
+    def get_size(self, all_props):
+        '''approximate memory used by a list of window props'''
+        size = self.entry_overhead
+        for key, value in all_props:
+            size += self.prop_overhead + len(key)
+            size += len(value) if isinstance(value, str) else self.prop_overhead
+        return size
+
+    def get(self, key, default=None):
+        '''return the cached window props for a listitem'''
+        with self.lock:
+            for group, entries in self.groups.items():
+                entry = entries.get(key)
+                if entry is None:
+                    continue
+                if time.time() - entry[1] > self.max_age:
+                    self._remove(group, key)
+                    self.stats["expired"] += 1
+                    break
+                entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+            return default
+
+    def __contains__(self, key):
+        '''plain lookup for a valid entry, leaves the stats and the lru order untouched'''
+        now = time.time()
+        with self.lock:
+            for entries in self.groups.values():
+                entry = entries.get(key)
+                if entry is not None:
+                    return now - entry[1] <= self.max_age
+            return False
+
+    def set(self, key, all_props, content_type):
+        '''store the window props of a listitem'''
+        group = self.get_group(content_type)
+        size = self.get_size(all_props)
+        with self.lock:
+            for other in self.groups:
+                self._remove(other, key)
+            entries = self.groups[group]
+            entries[key] = (all_props, time.time(), size)
+            self.sizes[group] += size
+            while self.sizes[group] > self.quotas[group] and len(entries) > 1:
+                self._remove(group, next(iter(entries)))
+                self.stats["evicted"] += 1
+
+    def _remove(self, group, key):
+        entry = self.groups[group].pop(key, None)
+        if entry is not None:
+            self.sizes[group] -= entry[2]
+
+    def purge_expired(self):
+        '''remove all entries older than max_age'''
+        oldest = time.time() - self.max_age
+        with self.lock:
+            for group, entries in self.groups.items():
+                for key in [key for key, entry in entries.items() if entry[1] < oldest]:
+                    self._remove(group, key)
+                    self.stats["expired"] += 1
+
+    def clear(self):
+        '''remove all entries'''
+        with self.lock:
+            for group in self.groups:
+                self.groups[group].clear()
+                self.sizes[group] = 0
+
+    def __repr__(self):
+        groups = ", ".join("%s: %s items/%s bytes" % (group, len(self.groups[group]), self.sizes[group])
+                           for group in sorted(self.groups))
+        return "DetailsCache(%s - hits: %s, misses: %s, evicted: %s, expired: %s)" % (
+            groups, self.stats["hits"], self.stats["misses"], self.stats["evicted"], self.stats["expired"])
+
 
 class ListItemMonitor(threading.Thread):
     '''Our main class monitoring the kodi listitems and providing additional information'''
     event = None
     exit = False
     delayed_task_interval = 1795
-    listitem_details = {}
+    listitem_details = None
     all_window_props = {}
     cur_listitem = ""
     last_folder = ""
@@ -39,6 +152,10 @@ class ListItemMonitor(threading.Thread):
     enable_extraposter = False
     enable_pvrart = False
     enable_forcedviews = False
+    # number of threads looking up listitem details
+    lookup_workers = 3
+    # number of items before and after the focused one to lookup in advance
+    prefetch_items = 2
 
     def __init__(self, *args, **kwargs):
         self.cache = SimpleCache()
@@ -46,21 +163,94 @@ class ListItemMonitor(threading.Thread):
         self.win = kwargs.get("win")
         self.kodimonitor = kwargs.get("monitor")
         self.event = threading.Event()
+        self.listitem_details = DetailsCache()
+        # lookup requests: (-focus generation, distance to focused item, sequence number, request details)
+        self.lookup_queue = queue.PriorityQueue()
+        self.lookup_lock = threading.Lock()
+        self.focus_generation = 0
+        self.lookup_count = 0
+        self.details_stats = {"focused": 0, "from_memory": 0, "total_wait": 0.0, "max_wait": 0.0,
+                              "prefetched": 0, "cancelled": 0}
         threading.Thread.__init__(self, *args)
 
     def stop(self):
         '''called when the thread has to stop working'''
         log_msg("ListItemMonitor - stop called")
         self.exit = True
+        for _ in range(self.lookup_workers):
+            self.lookup_queue.put((0, 0, 0, None))
+        self.log_details_stats()
         self.cache.close()
         self.event.set()
         self.event.clear()
         self.join(1)
 
+    def start_lookup_workers(self):
+        '''start our fixed number of threads that process the lookup queue'''
+        for count in range(self.lookup_workers):
+            worker = threading.Thread(target=self.lookup_worker, name="ListItemMonitor.lookup.%s" % count)
+            worker.daemon = True
+            worker.start()
+
+    def lookup_worker(self):
+        '''process lookup requests, newest focus first and closest to the focused item first'''
+        while not self.exit:
+            generation, distance, _, request = self.lookup_queue.get()
+            if request is None:
+                break
+            if -generation != self.focus_generation:
+                # focus moved on in the meantime
+                self.details_stats["cancelled"] += 1
+                continue
+            self.set_listitem_details(*request)
+
+    def queue_lookup(self, cur_listitem, content_type, prefix, listitem_ref="ListItem", distance=0):
+        '''add a lookup request for the current focus to the queue'''
+        with self.lookup_lock:
+            self.lookup_count += 1
+            count = self.lookup_count
+        queued = time.time() if not distance else None
+        self.lookup_queue.put((-self.focus_generation, distance, count,
+                               (cur_listitem, content_type, prefix, listitem_ref, queued)))
+
+    def prefetch_neighbours(self, content_type, cont_prefix):
+        '''queue lookups for the items around the focused one so their details are ready once focused'''
+        if not self.prefetch_items or getCondVisibility(INFO_DIALOGS):
+            return
+        prefix = cont_prefix or "Container."
+        for distance in range(1, self.prefetch_items + 1):
+            for offset in (distance, -distance):
+                listitem_ref = "ListItem(%s)" % offset
+                listitem = self.get_listitem_key(prefix, listitem_ref)
+                if (listitem and listitem != ".." and listitem not in self.listitem_details and
+                        not self.lookup_busy.get(listitem)):
+                    self.queue_lookup(listitem, content_type, prefix, listitem_ref, distance)
+
+    def record_details_time(self, queued, from_memory=False):
+        '''statistics: time between focusing an item and displaying its details'''
+        stats = self.details_stats
+        stats["focused"] += 1
+        if from_memory:
+            stats["from_memory"] += 1
+            return
+        wait = time.time() - queued
+        stats["total_wait"] += wait
+        stats["max_wait"] = max(stats["max_wait"], wait)
+
+    def log_details_stats(self):
+        '''log our time-to-details statistics'''
+        stats = self.details_stats
+        looked_up = stats["focused"] - stats["from_memory"]
+        log_msg("ListItemMonitor - focused items: %s, details already in memory: %s, prefetched: %s, "
+                "cancelled lookups: %s, average wait for details: %.2fs, max. wait: %.2fs" % (
+                    stats["focused"], stats["from_memory"], stats["prefetched"], stats["cancelled"],
+                    stats["total_wait"] / looked_up if looked_up else 0, stats["max_wait"]))
+
     def run(self):
         '''our main loop monitoring the listitem and folderpath changes'''
         log_msg("ListItemMonitor - started")
         self.get_settings()
+        self.start_lookup_workers()
 
         while not self.exit:
 
@@ -77,7 +267,7 @@ class ListItemMonitor(threading.Thread):
             if self.win.getProperty("SkinHelper.Artwork.ManualLookup"):
                 self.reset_win_props()
                 self.last_listitem = ""
-                self.listitem_details = {}
+                self.listitem_details.clear()
                 self.kodimonitor.waitForAbort(3)
                 self.delayed_task_interval += 3
 
@@ -128,7 +318,7 @@ class ListItemMonitor(threading.Thread):
         self.enable_forcedviews = getCondVisibility("Skin.HasSetting(SkinHelper.ForcedViews.Enabled)") == 1
         studiologos_path = xbmc.getInfoLabel("Skin.String(SkinHelper.StudioLogos.Path)")
         if studiologos_path != self.metadatautils.studiologos_path:
-            self.listitem_details = {}
+            self.listitem_details.clear()
             self.metadatautils.studiologos_path = studiologos_path
         # set additional window props to control contextmenus as using the skinsetting gives unreliable results
         for skinsetting in ["EnableAnimatedPosters", "EnableMusicArt", "EnablePVRThumbs"]:
@@ -141,16 +331,8 @@ class ListItemMonitor(threading.Thread):
         '''Monitor listitem details'''
 
         cur_folder, cont_prefix = self.get_folderandprefix()
-        # identify current listitem - prefer parent folder (tvshows, music)
-        cur_listitem = try_decode(xbmc.getInfoLabel(
-            "$INFO[%sListItem.TvshowTitle]$INFO[%sListItem.Artist]$INFO[%sListItem.Album]" %
-            (cont_prefix, cont_prefix, cont_prefix)))
-        if not cur_listitem:
-            # fallback to generic approach
-            cur_listitem = try_decode(xbmc.getInfoLabel(
-                "$INFO[%sListItem.Label]$INFO[%sListItem.DBID]$INFO[%sListItem.Title]" %
-                (cont_prefix, cont_prefix, cont_prefix)))
-                        
+        cur_listitem = self.get_listitem_key(cont_prefix)
+
         if self.exit:
             return
 
@@ -174,11 +356,30 @@ class ListItemMonitor(threading.Thread):
         # only perform actions when the listitem has actually changed
         if cur_listitem != self.last_listitem:
             self.last_listitem = cur_listitem
+            self.focus_generation += 1
             self.win.setProperty("curlistitem", cur_listitem)
             if cur_listitem and cur_listitem != "..":
-                # set listitem details in background thread
-                thread.start_new_thread(
-                    self.set_listitem_details, (cur_listitem, content_type, cont_prefix))
+                all_props = self.listitem_details.get(cur_listitem)
+                if all_props is not None:
+                    # data already in memory
+                    self.set_win_props(all_props)
+                    self.record_details_time(None, from_memory=True)
+                else:
+                    # set listitem details in background thread
+                    self.queue_lookup(cur_listitem, content_type, cont_prefix)
+                self.prefetch_neighbours(content_type, cont_prefix)
+
+    @staticmethod
+    def get_listitem_key(prefix, listitem_ref="ListItem"):
+        '''identify a listitem - prefer parent folder (tvshows, music)'''
+        listitem = "%s%s" % (prefix, listitem_ref)
+        cur_listitem = try_decode(xbmc.getInfoLabel(
+            "$INFO[%s.TvshowTitle]$INFO[%s.Artist]$INFO[%s.Album]" % (listitem, listitem, listitem)))
+        if not cur_listitem:
+            # fallback to generic approach
+            cur_listitem = try_decode(xbmc.getInfoLabel(
+                "$INFO[%s.Label]$INFO[%s.DBID]$INFO[%s.Title]" % (listitem, listitem, listitem)))
+        return cur_listitem
 
     def get_folderandprefix(self):
         '''get the current folder and prefix'''
@@ -186,7 +387,7 @@ class ListItemMonitor(threading.Thread):
         cont_prefix = ""
         try:
             widget_container = try_decode(self.win.getProperty("SkinHelper.WidgetContainer"))
-            if getCondVisibility("Window.IsActive(movieinformation)|Window.IsActive(DialogPVRInfo.xml)|Window.IsActive(DialogMusicInfo.xml)|Window.IsActive(script-script.extendedinfo-DialogVideoInfo.xml)"):
+            if getCondVisibility(INFO_DIALOGS):
                 cont_prefix = ""
                 cur_folder = try_decode(xbmc.getInfoLabel(
                     "$INFO[Window.Property(xmlfile)]$INFO[Container.FolderPath]"
@@ -269,43 +470,45 @@ class ListItemMonitor(threading.Thread):
                     else:
                         xbmc.sleep(500)
 
-    def set_listitem_details(self, cur_listitem, content_type, prefix):
-        '''set the window properties based on the current listitem'''
+    def set_listitem_details(self, cur_listitem, content_type, prefix, listitem_ref="ListItem", queued=None):
+        '''
+            set the window properties based on the listitem
+            listitem_ref is ListItem for the focused item or e.g. ListItem(2) to prefetch the details of a neighbour
+            queued is the time the focused item's lookup was requested
+        '''
         try:
-            if cur_listitem in self.listitem_details:
-                # data already in memory
-                all_props = self.listitem_details[cur_listitem]
-            else:
+            all_props = self.listitem_details.get(cur_listitem)
+            if all_props is None:
                 # skip if another lookup for the same listitem is already in progress...
-                if self.lookup_busy.get(cur_listitem) or self.exit:
-                    return
-                self.lookup_busy[cur_listitem] = True
-
-                # clear all window props, do this delayed to prevent flickering of the screen
-                thread.start_new_thread(self.delayed_flush, (cur_listitem,))
-
-                # wait if we already have more than 5 items in the queue
-                while len(self.lookup_busy) > 5:
-                    xbmc.sleep(100)
-                    if self.exit or cur_listitem != self.last_listitem:
-                        self.lookup_busy.pop(cur_listitem, None)
+                with self.lookup_lock:
+                    if self.lookup_busy.get(cur_listitem) or self.exit:
                         return
+                    self.lookup_busy[cur_listitem] = True
+
+                if queued:
+                    # clear all window props, do this delayed to prevent flickering of the screen
+                    thread.start_new_thread(self.delayed_flush, (cur_listitem,))
 
                 # prefer listitem's contenttype over container's contenttype
-                dbtype = xbmc.getInfoLabel("%sListItem.DBTYPE" % prefix)
+                dbtype = xbmc.getInfoLabel("%s%s.DBTYPE" % (prefix, listitem_ref))
                 if not dbtype:
-                    dbtype = xbmc.getInfoLabel("%sListItem.Property(DBTYPE)" % prefix)
+                    dbtype = xbmc.getInfoLabel("%s%s.Property(DBTYPE)" % (prefix, listitem_ref))
                 if dbtype:
                     content_type = dbtype + "s"
 
                 # collect details from listitem
-                details = self.get_listitem_details(content_type, prefix)
-                
-                if self.exit:
+                details = self.get_listitem_details(content_type, prefix, listitem_ref)
+
+                # make sure the focus did not move while we were reading the details
+                if self.exit or self.get_listitem_key(prefix, listitem_ref) != cur_listitem:
+                    self.lookup_busy.pop(cur_listitem, None)
+                    if not self.exit and not queued and cur_listitem == self.last_listitem:
+                        # the item we prefetched got focused in the meantime - lookup again as focused item
+                        self.queue_lookup(cur_listitem, content_type, prefix, "ListItem(0)")
                     return
 
                 # music content
-                if content_type in ["albums", "artists", "songs"] and self.enable_musicart:
+                if content_type in MUSIC_CONTENT and self.enable_musicart:
                     details = self.metadatautils.extend_dict(details, self.metadatautils.get_music_artwork(
                         details["artist"], details["album"], details["title"], details["discnumber"]))
                 # moviesets
@@ -383,18 +586,22 @@ class ListItemMonitor(threading.Thread):
                                 details["imdbnumber"], tvdbid, tmdbid, content_type), [
                                 "posters", "clearlogos", "banners", "discarts", "cleararts", "characterarts"])
                 # monitor listitem props when PVR is active
-                elif content_type in ["tvchannels", "tvrecordings", "channels", "recordings", "timers", "tvtimers"]:
-                    details = self.get_pvr_artwork(details, prefix)
+                elif content_type in PVR_CONTENT:
+                    details = self.get_pvr_artwork(details, prefix, listitem_ref)
 
                 # process all properties
                 all_props = prepare_win_props(details)
                 if "sets" not in content_type:
-                    self.listitem_details[cur_listitem] = all_props
+                    self.listitem_details.set(cur_listitem, all_props, content_type)
+                    if not queued:
+                        self.details_stats["prefetched"] += 1
 
                 self.lookup_busy.pop(cur_listitem, None)
 
             if cur_listitem == self.last_listitem:
                 self.set_win_props(all_props)
+                if queued:
+                    self.record_details_time(queued)
         except Exception as exc:
             log_exception(__name__, exc)
             self.lookup_busy.pop(cur_listitem, None)
@@ -411,8 +618,11 @@ class ListItemMonitor(threading.Thread):
             if self.exit:
                 return
             log_msg("Started Background worker...")
+            self.log_details_stats()
             self.set_generic_props()
-            self.listitem_details = {}
+            # details expire individually, no need to throw everything away
+            self.listitem_details.purge_expired()
+            log_msg("ListItemMonitor - %s" % self.listitem_details)
             if self.exit:
                 return
             self.cache.check_cleanup()
@@ -541,15 +751,16 @@ class ListItemMonitor(threading.Thread):
             'Writers': "[CR]".join(writers),
             'CastListing': cast_list}                        
 
-    def get_listitem_details(self, content_type, prefix):
+    def get_listitem_details(self, content_type, prefix, listitem_ref="ListItem"):
         '''collect all listitem properties/values we need'''
         listitem_details = {"art": {}}
+        prefix = "%s%s" % (prefix, listitem_ref)
 
         # basic properties
         for prop in ["dbtype", "dbid", "imdbnumber"]:
-            propvalue = try_decode(xbmc.getInfoLabel('$INFO[%sListItem.%s]' % (prefix, prop)))
+            propvalue = try_decode(xbmc.getInfoLabel('$INFO[%s.%s]' % (prefix, prop)))
             if not propvalue or propvalue == "-1":
-                propvalue = try_decode(xbmc.getInfoLabel('$INFO[%sListItem.Property(%s)]' % (prefix, prop)))
+                propvalue = try_decode(xbmc.getInfoLabel('$INFO[%s.Property(%s)]' % (prefix, prop)))
             listitem_details[prop] = propvalue
 
         # generic properties
@@ -569,7 +780,7 @@ class ListItemMonitor(threading.Thread):
         for prop in props:
             if self.exit:
                 break
-            propvalue = try_decode(xbmc.getInfoLabel('$INFO[%sListItem.%s]' % (prefix, prop)))
+            propvalue = try_decode(xbmc.getInfoLabel('$INFO[%s.%s]' % (prefix, prop)))
             listitem_details[prop] = propvalue
 
         # artwork properties
@@ -578,9 +789,9 @@ class ListItemMonitor(threading.Thread):
         for prop in artprops:
             if self.exit:
                 break
-            propvalue = try_decode(xbmc.getInfoLabel('$INFO[%sListItem.Art(%s)]' % (prefix, prop)))
+            propvalue = try_decode(xbmc.getInfoLabel('$INFO[%s.Art(%s)]' % (prefix, prop)))
             if not propvalue:
-                propvalue = try_decode(xbmc.getInfoLabel('$INFO[%sListItem.Art(tvshow.%s)]' % (prefix, prop)))
+                propvalue = try_decode(xbmc.getInfoLabel('$INFO[%s.Art(tvshow.%s)]' % (prefix, prop)))
             if propvalue:
                 listitem_details["art"][prop] = propvalue
 
@@ -626,10 +837,10 @@ class ListItemMonitor(threading.Thread):
         else:
             self.win.clearProperty("SkinHelper.ForcedView")
 
-    def get_pvr_artwork(self, listitem, prefix):
+    def get_pvr_artwork(self, listitem, prefix, listitem_ref="ListItem"):
         '''get pvr artwork from artwork module'''
         if self.enable_pvrart:
-            if getCondVisibility("%sListItem.IsFolder" % prefix) and not listitem[
+            if getCondVisibility("%s%s.IsFolder" % (prefix, listitem_ref)) and not listitem[
                     "channelname"] and not listitem["title"]:
                 listitem["title"] = listitem["label"]
             listitem = self.metadatautils.extend_dict(
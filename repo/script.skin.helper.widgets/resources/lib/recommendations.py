@@ -0,0 +1,232 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+'''
+    script.skin.helper.widgets
+    recommendations.py
+    score library items by their similarity to a list of reference items
+'''
+
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+import datetime
+
+# per mediatype: which features contribute to the similarity score and with which weight
+# sets: (name, weight, normalize) - jaccard index if normalize is None,
+#       otherwise sqrt(number of matches / normalize), only the first [normalize] entries are used
+# ranges: (name, weight, window) - closeness of the value, 0 if the difference is not smaller than window
+# equals: (name, weight) - 1 if both values are the same
+# boost: items in the same set (e.g. movie collection) get the square root of their score
+PROFILES = {
+    "movies": {
+        "idfield": "movieid",
+        "sets": [("genre", .5, None), ("director", .15, None), ("writer", .1, None), ("cast", .1, 5)],
+        "ranges": [("rating", .05, 3), ("year", .075, 10)],
+        "equals": [("mpaa", .025)],
+        "boost": "setid"
+    },
+    "tvshows": {
+        "idfield": "tvshowid",
+        "sets": [("genre", .5, None), ("cast", .35, 10)],
+        "ranges": [("rating", .025, 3), ("year", .05, 10)],
+        "equals": [("studio", .05), ("mpaa", .025)],
+        "boost": None
+    }
+}
+
+
+class FeatureStore(object):
+    '''
+        sparse feature vectors of library items, built only once per library revision
+        the vectors are kept in the (simple)cache and rebuilt when the library revision changes
+    '''
+
+    def __init__(self, mediatype, cache=None, revision=""):
+        self.profile = PROFILES[mediatype]
+        self.cache = cache if revision else None
+        self.revision = revision
+        self.cache_str = "SkinHelper.Widgets.features.%s" % mediatype
+        self.vectors = None
+        self.changed = False
+
+    def get(self, item):
+        '''get the feature vector for a library item'''
+        if self.vectors is None:
+            self.vectors = {}
+            if self.cache:
+                self.vectors = self.cache.get(self.cache_str, checksum=self.revision, json_data=True) or {}
+        item_id = str(item.get(self.profile["idfield"], ""))
+        vector = self.vectors.get(item_id) if item_id else None
+        if vector is None:
+            vector = self.build(item)
+            if item_id:
+                self.vectors[item_id] = vector
+                self.changed = True
+        return vector
+
+    def build(self, item):
+        '''
+            build the feature vector for a library item:
+            [feature set lists] + [range values] + [equality values] + [boost value]
+        '''
+        vector = []
+        for name, _, normalize in self.profile["sets"]:
+            if name == "cast":
+                values = [x["name"] for x in item.get("cast", [])[:normalize]]
+            elif normalize:
+                values = item.get(name, [])[:normalize]
+            else:
+                values = item.get(name, [])
+            vector.append(list(set(values)))
+        for name, _, _ in self.profile["ranges"]:
+            vector.append(item.get(name) or 0)
+        for name, _ in self.profile["equals"]:
+            value = item.get(name) or ""
+            # lists (e.g. studio) are compared as a whole
+            vector.append("/".join(value) if isinstance(value, list) else value)
+        if self.profile["boost"]:
+            vector.append(item.get(self.profile["boost"]) or 0)
+        return vector
+
+    def save(self):
+        '''store the feature vectors in the cache if we built new ones'''
+        if self.cache and self.changed:
+            self.cache.set(self.cache_str, self.vectors, checksum=self.revision,
+                           expiration=datetime.timedelta(days=7), json_data=True)
+            self.changed = False
+
+
+class Recommender(object):
+    '''
+        scores candidates against all reference items in a single pass:
+        set features are matched with an inverted index of the reference items,
+        range features with prefix sums over the sorted reference values
+    '''
+
+    def __init__(self, features, ref_items, weights=None):
+        self.features = features
+        self.profile = features.profile
+        self.ref_vectors = [features.get(item) for item in ref_items]
+        if weights is None:
+            weights = [1] * len(ref_items)
+        self.weights = weights
+        self.num_sets = len(self.profile["sets"])
+        self.num_ranges = len(self.profile["ranges"])
+        self.num_equals = len(self.profile["equals"])
+        # inverted index per set feature: value --> indexes of the reference items having it
+        self.set_index = []
+        for pos in range(self.num_sets):
+            index = {}
+            for ref_idx, vector in enumerate(self.ref_vectors):
+                for value in vector[pos]:
+                    index.setdefault(value, []).append(ref_idx)
+            self.set_index.append(index)
+        # sorted reference values per range feature with prefix sums of weight and weight*value
+        self.range_index = []
+        for pos in range(self.num_sets, self.num_sets + self.num_ranges):
+            values = sorted((vector[pos], self.weights[ref_idx])
+                            for ref_idx, vector in enumerate(self.ref_vectors) if vector[pos])
+            cum_weight = [0]
+            cum_value = [0]
+            for value, weight in values:
+                cum_weight.append(cum_weight[-1] + weight)
+                cum_value.append(cum_value[-1] + weight * value)
+            self.range_index.append(([x[0] for x in values], cum_weight, cum_value))
+        # summed weight per value of the equality features
+        self.equal_index = []
+        offset = self.num_sets + self.num_ranges
+        for pos in range(offset, offset + self.num_equals):
+            index = {}
+            for ref_idx, vector in enumerate(self.ref_vectors):
+                if vector[pos]:
+                    index[vector[pos]] = index.get(vector[pos], 0) + self.weights[ref_idx]
+            self.equal_index.append(index)
+        # reference items per boost value
+        self.boost_index = {}
+        if self.profile["boost"]:
+            for ref_idx, vector in enumerate(self.ref_vectors):
+                if vector[-1]:
+                    self.boost_index.setdefault(vector[-1], []).append(ref_idx)
+
+    def score(self, item):
+        '''the weighted sum of the similarity scores of item with every reference item'''
+        vector = self.features.get(item)
+        weights = self.weights
+        total = 0
+        matches = []
+        for pos, (_, feature_weight, normalize) in enumerate(self.profile["sets"]):
+            # number of matching values per reference item, only for reference items with matches
+            counts = {}
+            index = self.set_index[pos]
+            for value in vector[pos]:
+                for ref_idx in index.get(value, ()):
+                    counts[ref_idx] = counts.get(ref_idx, 0) + 1
+            matches.append(counts)
+            if normalize is None:
+                num_values = len(vector[pos])
+                ref_vectors = self.ref_vectors
+                for ref_idx, count in counts.items():
+                    union = len(ref_vectors[ref_idx][pos]) + num_values - count
+                    total += weights[ref_idx] * feature_weight * count / union
+            else:
+                for ref_idx, count in counts.items():
+                    total += weights[ref_idx] * feature_weight * (float(count) / normalize) ** .5
+        for pos, (_, feature_weight, window) in enumerate(self.profile["ranges"]):
+            value = vector[self.num_sets + pos]
+            if value:
+                values, cum_weight, cum_value = self.range_index[pos]
+                start = bisect_right(values, value - window)
+                middle = bisect_left(values, value, start)
+                end = bisect_left(values, value + window, middle)
+                # sum of weight * (1 - |ref_value - value| / window) for all reference values within the window
+                distance = value * (cum_weight[middle] - cum_weight[start]) - (cum_value[middle] - cum_value[start]) + \
+                    (cum_value[end] - cum_value[middle]) - value * (cum_weight[end] - cum_weight[middle])
+                total += feature_weight * ((cum_weight[end] - cum_weight[start]) - float(distance) / window)
+        offset = self.num_sets + self.num_ranges
+        for pos, (_, feature_weight) in enumerate(self.profile["equals"]):
+            value = vector[offset + pos]
+            if value:
+                total += feature_weight * self.equal_index[pos].get(value, 0)
+        if self.boost_index and vector[-1]:
+            # the score is scaled non-linearly, so for the (few) reference items in the same set
+            # we replace their linear share in the total with the scaled score
+            for ref_idx in self.boost_index.get(vector[-1], ()):
+                similarscore = self.pair_score(ref_idx, vector, matches)
+                total += weights[ref_idx] * (similarscore ** .5 - similarscore)
+        return total
+
+    def pair_score(self, ref_idx, vector, matches):
+        '''the similarity score of a vector with a single reference item'''
+        ref_vector = self.ref_vectors[ref_idx]
+        similarscore = 0
+        for pos, (_, feature_weight, normalize) in enumerate(self.profile["sets"]):
+            count = matches[pos].get(ref_idx, 0)
+            if count and normalize is None:
+                similarscore += feature_weight * float(count) / (len(ref_vector[pos]) + len(vector[pos]) - count)
+            elif count:
+                similarscore += feature_weight * (float(count) / normalize) ** .5
+        for pos, (_, feature_weight, window) in enumerate(self.profile["ranges"]):
+            pos += self.num_sets
+            if vector[pos] and ref_vector[pos] and abs(vector[pos] - ref_vector[pos]) < window:
+                similarscore += feature_weight * (1 - float(abs(vector[pos] - ref_vector[pos])) / window)
+        offset = self.num_sets + self.num_ranges
+        for pos, (_, feature_weight) in enumerate(self.profile["equals"]):
+            pos += offset
+            if ref_vector[pos] and ref_vector[pos] == vector[pos]:
+                similarscore += feature_weight
+        return similarscore
+
+
+def sort_by_recommended(features, all_items, ref_items, limit, weights=None):
+    '''
+        set the recommendedscore of all items: the averaged similarity with the reference items,
+        lowered for items that were played before - returns the items sorted by score and capped by limit
+    '''
+    if not ref_items:
+        return all_items[:limit]
+    recommender = Recommender(features, ref_items, weights)
+    num_refs = len(ref_items)
+    for item in all_items:
+        item["recommendedscore"] = recommender.score(item) / (1 + item["playcount"]) / num_refs
+    features.save()
+    return sorted(all_items, key=itemgetter("recommendedscore"), reverse=True)[:limit]
@@ -12,6 +12,7 @@ import random
 import xbmc
 from metadatautils import kodi_constants
 from resources.lib.utils import create_main_entry, KODI_VERSION, log_msg
+from resources.lib.recommendations import FeatureStore, sort_by_recommended
 
 class Tvshows(object):
     '''all tvshow widgets provided by the script'''
@@ -393,23 +394,9 @@ class Tvshows(object):
             weights = dict()
             for item in ref_shows:
                 weights[item['title']] = 1
-        # predefine feature sets
-        ref_sets = dict()
-        for ref_show in ref_shows:
-            title = ref_show['title']
-            set_genres = set(ref_show["genre"])
-            set_cast = set([x["name"] for x in ref_show["cast"][:10]])
-            ref_sets[title] = (set_genres, set_cast)
-        # average scores together for every item
-        for item in all_items:
-            similarscore = 0
-            for ref_show in ref_shows:
-                title = ref_show['title']
-                similarscore += weights[title] * self.get_similarity_score(
-                    ref_show, item, sets=ref_sets[title])
-            item["recommendedscore"] = similarscore / (1+item["playcount"]) / len(ref_shows)
-        # return sorted list capped by limit
-        return sorted(all_items, key=itemgetter("recommendedscore"), reverse=True)[:self.options["limit"]]
+        features = FeatureStore("tvshows", self.metadatautils.cache, self.options.get("reload", ""))
+        return sort_by_recommended(features, all_items, ref_shows, self.options["limit"],
+                                   weights=[weights[item['title']] for item in ref_shows])
 
     @staticmethod
     def get_similarity_score(ref_show, other_show, sets=None):
@@ -3,6 +3,7 @@ import xbmc, xbmcaddon, xbmcgui, xbmcvfs
 import xml.etree.ElementTree as xmltree
 import hashlib
 import ast
+import json
 from xml.dom.minidom import parse
 from traceback import print_exc
 from unidecode import unidecode
@@ -1050,7 +1051,7 @@ class DataFunctions():
 
     def parseHashFile( self, file ):
         try:
-            hashes = ast.literal_eval( xbmcvfs.File( file ).read() )
+            hashes = self._load_hashes( file )
         except:
             # There is no hash list, return False
             return( False, "" )
@@ -1092,11 +1093,30 @@ class DataFunctions():
         if file is not None:
             hasher = hashlib.md5()
             hasher.update(xbmcvfs.File(filename).read().encode("utf-8"))
-            hashlist.append([filename, hasher.hexdigest()])
+            hashlist.append([filename, hasher.hexdigest()] + self._stat_file( filename ))
         else:
             hashlist.append([filename, None])
 
 
+    def _stat_file( self, filename ):
+        # Returns the modification time (in ns) and size of a file, so that unchanged files
+        # don't have to be hashed again when checking whether the menu needs rebuilding
+        try:
+            stat = os.stat( filename )
+            return [ stat.st_mtime_ns, stat.st_size ]
+        except:
+            return [ None, None ]
+
+
+    def _load_hashes( self, file ):
+        # The hash list is saved as json - older versions of the script saved it as a python literal
+        contents = xbmcvfs.File( file ).read()
+        try:
+            return json.loads( contents )
+        except ValueError:
+            return ast.literal_eval( contents )
+
+
     # in-place prettyprint formatter
     def indent( self, elem, level=0 ):
         i = "\n" + level*"\t"
@@ -900,9 +900,13 @@ class Template():
         if file is not None:
             hasher = hashlib.md5()
             hasher.update(file.encode("utf8"))
-            hashlist.append([filename.encode("utf8"), hasher.hexdigest()])
+            try:
+                stat = os.stat( filename )
+                hashlist.append([filename, hasher.hexdigest(), stat.st_mtime_ns, stat.st_size])
+            except:
+                hashlist.append([filename, hasher.hexdigest(), None, None])
         else:
-            hashlist.append([filename.encode("utf8"), None])
+            hashlist.append([filename, None])
 
     def copy_tree( self, elem ):
         if elem is None: return None
@@ -1,5 +1,5 @@
 # coding=utf-8
-import os, sys, datetime, unicodedata, re
+import os, sys, datetime, unicodedata, re, time
 import xbmc, xbmcgui, xbmcvfs, xbmcaddon
 import xml.etree.ElementTree as xmltree
 from xml.sax.saxutils import escape as escapeXML
@@ -150,6 +150,14 @@ class XMLFunctions():
                         xbmcgui.Dialog().ok(ADDON.getAddonInfo("name"), LANGUAGE(32092) + "[CR]" + LANGUAGE(32094))
 
     def shouldwerun( self, profilelist ):
+        # Time the check, as it runs on every skin load and profile switch
+        startTime = time.time()
+        self.checkedFiles = { "stat": 0, "hashed": 0 }
+        result = self._shouldwerun( profilelist )
+        log( "Checked whether the menu needs rebuilding in %.3fs (%d files unchanged, %d files hashed)" %( time.time() - startTime, self.checkedFiles[ "stat" ], self.checkedFiles[ "hashed" ] ) )
+        return result
+
+    def _shouldwerun( self, profilelist ):
         try:
             property = xbmcgui.Window( 10000 ).getProperty( "skinshortcuts-reloadmainmenu" )
             xbmcgui.Window( 10000 ).clearProperty( "skinshortcuts-reloadmainmenu" )
@@ -195,12 +203,19 @@ class XMLFunctions():
             log( "Hash list does not exist" )
             return True
         try:
-            hashes = ast.literal_eval( xbmcvfs.File( hashesPath ).read() )
+            hashes = DATA._load_hashes( hashesPath )
         except:
             log( "Unable to parse hash list" )
             print_exc()
             return True
 
+        # Files modified after (or in the same instant as) the hash list was written may have changed
+        # without their modification time changing, so those always have to be hashed
+        written = 0
+        for hash in hashes:
+            if hash[0] == "::WRITTEN::":
+                written = hash[1]
+
         checkedXBMCVer = False
         checkedSkinVer = False
         checkedScriptVer = False
@@ -258,10 +273,17 @@ class XMLFunctions():
                 elif hash[0] == "::FULLMENU::":
                     # Mark that we need to set the fullmenu bool
                     foundFullMenu = True
-                elif hash[0] == "::SKINDIR::":
-                    # Used to import menus from one skin to another, nothing to check here
+                elif hash[0] == "::SKINDIR::" or hash[0] == "::WRITTEN::":
+                    # Used to import menus from one skin to another / when the hash list was written,
+                    # nothing to check here
                     pass
                 else:
+                    # If the modification time and size haven't changed, neither has the file
+                    if len( hash ) == 4 and hash[ 2 ] is not None and hash[ 2 ] < written:
+                        if DATA._stat_file( hash[ 0 ] ) == hash[ 2: ]:
+                            self.checkedFiles[ "stat" ] += 1
+                            continue
+                    self.checkedFiles[ "hashed" ] += 1
                     try:
                         hasher = hashlib.md5()
                         hasher.update(xbmcvfs.File(hash[0]).read().encode("utf-8"))
@@ -682,9 +704,16 @@ class XMLFunctions():
         # Append the skin version to the hashlist
         hashlist.append( ["::SKINVER::", skinVersion] )
 
+        # Append the hashes of all files we've read or written while building the menu
+        fileHashes = {}
+        for hash in datafunctions.hashlist + template.hashlist:
+            fileHashes[ hash[ 0 ] ] = hash
+        hashlist.extend( fileHashes.values() )
+        hashlist.append( ["::WRITTEN::", time.time_ns()] )
+
         # Save the hashes
         file = xbmcvfs.File( os.path.join( MASTERPATH , xbmc.getSkinDir() + ".hash" ), "w" )
-        file.write(repr(hashlist))
+        file.write( simplejson.dumps( hashlist, separators = ( ",", ":" ) ) )
         file.close()
 
 